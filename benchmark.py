@@ -0,0 +1,282 @@
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from general_tools import *
+from genetic_algorithm import initiate_population, tournament_selection, ranked_selection, genetic_algorithm
+from crossover import pmx_offspring
+from hill_climbing import get_neighbors, hill_climbing
+from hybrid_algorithm import hybrid_algorithm
+from instances import from_coordinates
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, peak memory is then left out
+    resource = None
+
+SIZES = (24, 100, 1000, 10000)
+SEED = 2021
+
+# Seconds a fresh interpreter may spend importing each entry point, numpy included
+IMPORT_BUDGET = {
+    "solve": 0.3,
+    "genetic_algorithm": 0.3,
+    "hybrid_algorithm": 0.3,
+    "hill_climbing": 0.3,
+    "exhaustive_search": 0.3,
+}
+# Modules that only plotting and the KD-tree need, none of the entry points may import them
+HEAVY_MODULES = ("matplotlib", "scipy")
+
+
+def load_workload(n, seed=SEED):
+    """
+    The instance a benchmark runs on. 24 is european_cities.csv, other sizes
+    are random cities in a 1000x1000 square, with a dense distance table up
+    to 1000 cities and distances computed on demand above that.
+    Args:
+        n (int): Number of cities
+        seed (int)
+
+    Returns:
+        Tuple containing names of cities and the distances
+    """
+    if n == 24:
+        return read_file("european_cities.csv")
+    coordinates = np.random.default_rng(seed).random((n, 2)) * 1000
+    return from_coordinates(coordinates, lazy=n > 1000)
+
+
+def bench_measure_distances(cities, distances, rng):
+    tours = initiate_population(1000, cities, distances, rng=rng).tours
+    for _ in range(10):
+        measure_distances(tours, distances)
+    return {"evaluations": 10 * len(tours)}
+
+
+def bench_pmx(cities, distances, rng):
+    tours = initiate_population(1000, cities, distances, rng=rng).tours
+    for _ in range(5):
+        pmx_offspring(tours, rng)
+    return {"children": 5 * len(tours)}
+
+
+def bench_ranked_selection(cities, distances, rng):
+    population = initiate_population(1000, cities, distances, rng=rng)
+    for _ in range(20):
+        ranked_selection(population, len(population), rng)
+    return {"selections": 20 * len(population)}
+
+
+def bench_tournament_selection(cities, distances, rng):
+    population = initiate_population(1000, cities, distances, rng=rng)
+    for _ in range(5):
+        tournament_selection(population, len(population), 5, rng)
+    return {"selections": 5 * len(population)}
+
+
+def bench_get_neighbors(cities, distances, rng):
+    tour = rng.permutation(len(cities))
+    for _ in range(5):
+        get_neighbors(tour, distances)
+    return {"neighborhoods": 5}
+
+
+def bench_hill_climbing(cities, distances, rng):
+    tour, dist = hill_climbing(cities, distances, rng=rng)
+    return {"runs": 1, "quality": dist}
+
+
+def bench_genetic_algorithm(cities, distances, rng):
+    result = genetic_algorithm(cities, distances, 50, 0.5, 50, rng=rng)
+    return {"generations": 50, "quality": result[1]}
+
+
+def bench_hybrid_algorithm(cities, distances, rng):
+    tour, dist, _ = hybrid_algorithm(cities, distances, 20, 0.5, 5, rng=rng)
+    return {"generations": 5, "quality": dist}
+
+
+# name: (function, largest instance it runs on)
+BENCHMARKS = {
+    "measure_distances": (bench_measure_distances, 10000),
+    "pmx": (bench_pmx, 10000),
+    "ranked_selection": (bench_ranked_selection, 10000),
+    "tournament_selection": (bench_tournament_selection, 10000),
+    "get_neighbors": (bench_get_neighbors, 100),
+    "hill_climbing": (bench_hill_climbing, 100),
+    "genetic_algorithm": (bench_genetic_algorithm, 1000),
+    "hybrid_algorithm": (bench_hybrid_algorithm, 100),
+}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_benchmark(name, n, seed=SEED):
+    """
+    Runs one benchmark on one instance size with fixed seeds. Meant to run in
+    a fresh process so that the peak memory belongs to this benchmark alone.
+    Args:
+        name (str): key in BENCHMARKS
+        n (int): Number of cities
+        seed (int)
+
+    Returns:
+        Dict with wall time, work done per second, peak memory and solution quality
+    """
+    cities, distances = load_workload(n, seed)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    work = BENCHMARKS[name][0](cities, distances, rng)
+    wall_time = time.perf_counter() - start
+
+    result = {"benchmark": name, "n": n, "wall_time": wall_time, "peak_rss_mb": _peak_rss_mb(),
+              "quality": work.pop("quality", None)}
+    for unit, amount in work.items():
+        result[f"{unit}_per_sec"] = amount / wall_time
+    return result
+
+
+def run_suite(names=None, sizes=SIZES, seed=SEED):
+    """
+    Runs the benchmarks on every size they support, each in its own process
+    Args:
+        names (list): benchmarks to run, defaults to all of BENCHMARKS
+        sizes (list): instance sizes
+        seed (int)
+
+    Returns:
+        List of results from run_benchmark
+    """
+    results = []
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        for name in names or BENCHMARKS:
+            for n in sizes:
+                if n <= BENCHMARKS[name][1]:
+                    result = pool.apply(run_benchmark, (name, n, seed))
+                    print(f"{name:22} n={n:<6} {result['wall_time']:9.4f} s", flush=True)
+                    results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compares results with a baseline. A benchmark regresses when its wall
+    time or solution quality is more than tolerance worse than the baseline.
+    Args:
+        results (list): results from run_suite
+        baseline (list): earlier results from run_suite
+        tolerance (float): allowed relative slowdown
+
+    Returns:
+        List of strings describing each regression
+    """
+    previous = {(result["benchmark"], result["n"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["benchmark"], result["n"]))
+        if before is None:
+            continue
+        for key in ("wall_time", "quality"):
+            if result[key] is not None and before[key] is not None and result[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{result['benchmark']} n={result['n']}: {key} "
+                                   f"{before[key]:.4g} -> {result[key]:.4g}")
+    return regressions
+
+
+def measure_import(module, repeat=5):
+    """
+    Measures how long importing a module takes in a fresh interpreter, the
+    way a short-lived solver process starts
+    Args:
+        module (str): name of the module
+        repeat (int): number of interpreters, the shortest time is kept
+
+    Returns:
+        Dict with the module, its import time and the HEAVY_MODULES it loaded
+    """
+    code = (f"import json, sys, time\n"
+            f"start = time.perf_counter()\n"
+            f"import {module}\n"
+            f"print(json.dumps([time.perf_counter() - start, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))")
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        seconds, loaded = json.loads(output)
+        times.append(seconds)
+    return {"module": module, "import_time": min(times), "loaded": loaded}
+
+
+def check_imports(budget=IMPORT_BUDGET, repeat=5):
+    """
+    Checks the import time of each module against its budget
+    Args:
+        budget (dict): seconds allowed for each module
+        repeat (int): see measure_import
+
+    Returns:
+        List of strings describing each module that is over its budget or
+        loads one of the HEAVY_MODULES
+    """
+    regressions = []
+    for module, seconds in budget.items():
+        result = measure_import(module, repeat)
+        print(f"import {module:22} {result['import_time']:9.4f} s", flush=True)
+        if result["import_time"] > seconds:
+            regressions.append(f"import {module}: {result['import_time']:.4g} s, budget {seconds:.4g} s")
+        if result["loaded"]:
+            regressions.append(f"import {module}: loads {', '.join(result['loaded'])}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the TSP algorithms")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="instance sizes")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default="benchmark_results.json", help="file to write results to")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--imports", action="store_true", help="only check the import time of the entry points, "
+                                                               "see IMPORT_BUDGET")
+    args = parser.parse_args()
+
+    if args.imports:
+        regressions = check_imports()
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+    results = run_suite(args.benchmarks, args.sizes, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        return
+
+    try:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    except FileNotFoundError:
+        print(f"No baseline in {args.baseline}, run with --save-baseline to create one")
+        return
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import os
+import numpy as np
+from instances import CoordinateDistances, geo, haversine
+from geodesic import unit_vectors, kd_tree
+
+
+def nearest_neighbors(distances, k, chunk_size=1024):
+    """
+    Function that finds the k closest cities of every city from the distance
+    table. Works through the table a block of rows at a time, so it also
+    works on memory mapped and lazily computed tables.
+    Args:
+        distances (2d-array): table over distances
+        k (int): number of neighbors to keep for each city
+        chunk_size (int): rows of the table to look at at once
+
+    Returns:
+        2d-array where row i holds the k cities closest to city i, closest first
+    """
+    n = len(distances)
+    k = min(k, n - 1)
+    closest = np.empty((n, max(k, 0)), dtype=np.int32)
+    if k <= 0:
+        return closest
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        rows = np.arange(stop - start)[:, np.newaxis]
+        block = np.array(distances[start:stop], dtype=float)
+        block[rows[:, 0], np.arange(start, stop)] = np.inf
+        part = np.argpartition(block, k - 1, axis=1)[:, :k]
+        closest[start:stop] = part[rows, np.argsort(block[rows, part], axis=1)]
+    return closest
+
+
+def _points(distances):
+    """
+    Points that a KD-tree can search when distances are computed from
+    coordinates, GEO and haversine coordinates are placed on the unit sphere
+    """
+    coordinates = distances.coordinates
+    if distances.metric is haversine:
+        return unit_vectors(coordinates)
+    if distances.metric is geo:
+        degrees = np.trunc(coordinates)
+        latitude, longitude = np.radians(degrees + 5 * (coordinates - degrees) / 3).T
+        return np.column_stack((np.cos(latitude) * np.cos(longitude),
+                                np.cos(latitude) * np.sin(longitude), np.sin(latitude)))
+    return coordinates
+
+
+def candidate_lists(distances, k=10):
+    """
+    Builds the candidate lists of an instance, the k nearest neighbors of
+    every city. Uses a KD-tree over the coordinates when the distances are
+    computed from coordinates and scipy is installed, otherwise the distance
+    table. Local search and the construction heuristics restrict their moves
+    to these lists, load_candidate_lists keeps them next to the instance.
+    Args:
+        distances (2d-array): table over distances
+        k (int): number of candidates for each city
+
+    Returns:
+        2d-array where row i holds the k cities closest to city i, closest first
+    """
+    n = len(distances)
+    tree = None
+    if isinstance(distances, CoordinateDistances) and 0 < k < n - 1:
+        tree = kd_tree(_points(distances))
+    if tree is not None:
+        _, closest = tree.query(_points(distances), k + 1)
+        # The city itself is usually first, but not when other cities share its coordinates
+        own = closest == np.arange(n)[:, np.newaxis]
+        own[~own.any(axis=1), -1] = True
+        return closest[~own].reshape(n, k).astype(np.int32)
+    return nearest_neighbors(distances, k)
+
+
+def candidates_file(instance_file, k):
+    """
+    Args:
+        instance_file (str): filename of an instance
+        k (int): number of candidates for each city
+
+    Returns:
+        (str): filename of the candidate lists cached for it
+    """
+    return f"{instance_file}.cand{k}.npy"
+
+
+def load_candidate_lists(instance_file, distances, k=10):
+    """
+    Loads the candidate lists of an instance from the .npy file next to it,
+    building and saving them the first time.
+    Args:
+        instance_file (str): filename of the instance
+        distances (2d-array): table over distances of the instance
+        k (int): number of candidates for each city
+
+    Returns:
+        2d-array where row i holds the k cities closest to city i, closest first
+    """
+    cached = candidates_file(instance_file, k)
+    if os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(instance_file):
+        return np.load(cached)
+    closest = candidate_lists(distances, k)
+    np.save(cached, closest)
+    return closest
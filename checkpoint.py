@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import tempfile
+import numpy as np
+from general_tools import *
+
+
+def save_checkpoint(checkpoint_file, population, generation, best_of_each_gen, settings=None, rng=None):
+    """
+    Saves the state of a run to a compressed .npz file: the tours and
+    fitness of the population, the generation, the best distance of each
+    generation so far and the state of the random number generator. The file is written to a
+    temporary file first and moved into place, so a run killed while saving
+    leaves the previous checkpoint as it was.
+    Args:
+        checkpoint_file (str): filename, should end with .npz
+        population (Population)
+        generation (int): generations done
+        best_of_each_gen (list): shortest distance of each generation
+        settings (dict): parameters of the run, stored as JSON so that it can
+                         be resumed with only the instance file, see resume
+        rng (np.random.Generator): generator of the run, its state is stored
+                                   so a resumed run draws the same numbers
+    """
+    rng_state = None if rng is None else rng.bit_generator.state
+    directory = os.path.dirname(os.path.abspath(checkpoint_file))
+    fd, temporary = tempfile.mkstemp(suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, tours=population.tours, fitness=population.fitness,
+                                generation=generation, best_of_each_gen=np.asarray(best_of_each_gen, dtype=float),
+                                rng_state=json.dumps(rng_state), settings=json.dumps(settings or {}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, checkpoint_file)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_checkpoint(checkpoint_file):
+    """
+    Loads a checkpoint written by save_checkpoint
+    Args:
+        checkpoint_file (str): filename
+
+    Returns:
+        Dict with population, generation, best_of_each_gen, settings and
+        rng_state, the state of the bit generator or None if not saved
+    """
+    with np.load(checkpoint_file) as data:
+        return {
+            "population": Population(data["tours"], data["fitness"]),
+            "generation": int(data["generation"]),
+            "best_of_each_gen": data["best_of_each_gen"].tolist(),
+            "settings": json.loads(str(data["settings"])),
+            "rng_state": json.loads(str(data["rng_state"])) if "rng_state" in data else None,
+        }
+
+
+def warm_start_population(population, checkpoint_file, fraction=0.5):
+    """
+    Replaces the worst individuals of a population with the best ones of an
+    earlier run
+    Args:
+        population (Population)
+        checkpoint_file (str): checkpoint of the earlier run
+        fraction (float): largest part of the population to replace
+
+    Returns:
+        New population
+    """
+    previous = load_checkpoint(checkpoint_file)["population"]
+    if previous.tours.shape[1] != population.tours.shape[1]:
+        raise ValueError(f"{checkpoint_file} has tours of {previous.tours.shape[1]} cities, "
+                         f"not {population.tours.shape[1]}")
+    count = min(len(previous), int(round(fraction * len(population))))
+    best = previous.take(np.argsort(previous.fitness)[:count])
+    keep = population.take(np.argsort(population.fitness)[:len(population) - count])
+    return keep.extend(best)
+
+
+def _operator(settings, key, default):
+    """
+    Name of an operator stored in settings. Checkpoints from before the key
+    was stored used the default, None means the run used a function that
+    isn't in the dict of its operators.
+    """
+    if key not in settings:
+        return default
+    if settings[key] is None:
+        raise ValueError(f"The run used a {key} function that isn't in {key.upper()}S, pass it to "
+                         f"genetic_algorithm with resume=True instead")
+    return settings[key]
+
+
+def resume(checkpoint_file, instance_file, num_gens=None, checkpoint_interval=10):
+    """
+    Resumes a genetic_algorithm run from its checkpoint, with the settings
+    stored in the file. Raises ValueError if the run used a crossover,
+    mutation or selection function that isn't one of the named ones.
+    Args:
+        checkpoint_file (str): filename
+        instance_file (str): instance of the run, see instances.load_instance
+        num_gens (int): total number of generations, defaults to the stored one
+        checkpoint_interval (int): generations between each checkpoint
+
+    Returns:
+        The return value of genetic_algorithm
+    """
+    from genetic_algorithm import genetic_algorithm
+    from instances import load_instance
+
+    settings = load_checkpoint(checkpoint_file)["settings"]
+    crossover = _operator(settings, "crossover", "pmx")
+    mutation = _operator(settings, "mutation", "insert")
+    selection = _operator(settings, "selection", "ranked")
+    cities, distances = load_instance(instance_file)
+    return genetic_algorithm(cities, distances, settings["pop_size"], settings["p_mutation"],
+                             num_gens or settings["num_gens"], crossover, mutation=mutation,
+                             unique=settings.get("unique", False), checkpoint=checkpoint_file,
+                             checkpoint_interval=checkpoint_interval, resume=True, selection=selection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume a genetic algorithm run from its checkpoint")
+    parser.add_argument("checkpoint", help="checkpoint file written by genetic_algorithm")
+    parser.add_argument("instance", help="instance file of the run")
+    parser.add_argument("--generations", type=int, help="total number of generations")
+    parser.add_argument("--interval", type=int, default=10, help="generations between each checkpoint")
+    args = parser.parse_args()
+
+    tour, dist, _, reason = resume(args.checkpoint, args.instance, args.generations, args.interval)
+    print(f"Shortest distance: {dist} ({reason})")
+    print(tour)
+
+
+if __name__ == '__main__':
+    main()
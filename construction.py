@@ -0,0 +1,306 @@
+import numpy as np
+from general_tools import *
+from candidates import candidate_lists
+from instances import CoordinateDistances
+
+
+def _row(distances, city):
+    """
+    Distances from a city to every city, as a float array that can be changed
+    """
+    return np.array(distances[city], dtype=float)
+
+
+def nearest_neighbor(distances, start=None, rng=None):
+    """
+    Nearest neighbor tour: starts in a city and keeps going to the closest
+    city not visited yet. O(n^2), one vectorized row per step.
+    Args:
+        distances (2d-array): table over distances
+        start (int): first city, random if not given
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        (np.array): the tour
+    """
+    return randomized_nearest_neighbor(distances, start, 1, 0.0, rng)
+
+
+def randomized_nearest_neighbor(distances, start=None, k=3, p_random=0.1, rng=None):
+    """
+    Nearest neighbor tour that now and then goes to a random one of the k
+    closest cities not visited yet instead of the closest, which gives a
+    different good tour every time
+    Args:
+        distances (2d-array): table over distances
+        start (int): first city, random if not given
+        k (int): number of closest cities to choose from
+        p_random (float): chance of not going to the closest city
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        (np.array): the tour
+    """
+    rng = np.random.default_rng(rng)
+    n = len(distances)
+    # All random numbers of the tour are drawn up front
+    draws = rng.random((n, 2))
+    tour = np.empty(n, dtype=int)
+    tour[0] = int(draws[0, 0] * n) if start is None else start
+    visited = np.zeros(n, dtype=bool)
+    visited[tour[0]] = True
+    for step in range(1, n):
+        row = _row(distances, tour[step - 1])
+        row[visited] = np.inf
+        choices = min(k, n - step)
+        if choices == 1 or draws[step, 0] >= p_random:
+            city = np.argmin(row)
+        else:
+            city = np.argpartition(row, choices - 1)[int(draws[step, 1] * choices)]
+        tour[step] = city
+        visited[city] = True
+    return tour
+
+
+def _join_paths(distances, paths):
+    """
+    Joins paths into one tour, by going from the end of the tour built so far
+    to the closest end of another path
+    """
+    tour = list(paths[0])
+    rest = [path for path in paths[1:]]
+    while rest:
+        ends = np.array([[path[0], path[-1]] for path in rest])
+        gaps = np.asarray(distances[tour[-1], ends.ravel()], dtype=float)
+        best = int(np.argmin(gaps))
+        path = rest.pop(best // 2)
+        tour.extend(path if best % 2 == 0 else path[::-1])
+    return np.array(tour)
+
+
+def greedy_edge(distances, neighbors=None):
+    """
+    Greedy edge tour: goes through the edges to the candidate neighbors from
+    shortest to longest and keeps an edge if both its cities have fewer than
+    two edges and it does not close a cycle. The paths that are left are
+    joined by their closest ends. O(nk log nk) for k neighbors per city.
+    Args:
+        distances (2d-array): table over distances
+        neighbors (2d-array): candidate lists, defaults to the 10 closest cities
+
+    Returns:
+        (np.array): the tour
+    """
+    n = len(distances)
+    if neighbors is None:
+        neighbors = candidate_lists(distances, min(10, n - 1))
+    a = np.repeat(np.arange(n), neighbors.shape[1])
+    b = np.asarray(neighbors).ravel()
+    a, b = np.unique(np.column_stack((np.minimum(a, b), np.maximum(a, b))), axis=0).T
+    order = np.argsort(np.asarray(distances[a, b], dtype=float), kind="stable")
+
+    degree = np.zeros(n, dtype=int)
+    root = np.arange(n)
+    adjacent = [[] for _ in range(n)]
+
+    def find(city):
+        while root[city] != city:
+            root[city] = root[root[city]]
+            city = root[city]
+        return city
+
+    for i, j in zip(a[order].tolist(), b[order].tolist()):
+        if degree[i] < 2 and degree[j] < 2 and find(i) != find(j):
+            root[find(i)] = find(j)
+            degree[i] += 1
+            degree[j] += 1
+            adjacent[i].append(j)
+            adjacent[j].append(i)
+
+    # Every path starts and ends in a city with fewer than two edges
+    paths = []
+    in_path = np.zeros(n, dtype=bool)
+    for city in np.flatnonzero(degree < 2).tolist():
+        if in_path[city]:
+            continue
+        path, previous = [city], None
+        while len(path) == 1 and adjacent[city] or len(path) > 1 and len(adjacent[path[-1]]) == 2:
+            nxt = next(c for c in adjacent[path[-1]] if c != previous)
+            previous = path[-1]
+            path.append(nxt)
+        in_path[path] = True
+        paths.append(path)
+    return _join_paths(distances, paths)
+
+
+def _hilbert_index(x, y, order):
+    """
+    Position of integer points along a Hilbert curve over a 2**order grid
+    """
+    x, y = x.copy(), y.copy()
+    side = 1 << order
+    index = np.zeros(len(x), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        index += s * s * ((3 * rx) ^ ry)
+        flip = ~ry & rx
+        x[flip], y[flip] = side - 1 - x[flip], side - 1 - y[flip]
+        turn = ~ry
+        x[turn], y[turn] = y[turn], x[turn]
+        s >>= 1
+    return index
+
+
+def _embedding(distances, iterations=100):
+    """
+    Plane coordinates for a distance table without them, from the two
+    largest components of classical multidimensional scaling found by power
+    iteration. O(n^2) per iteration.
+    """
+    squared = np.asarray(distances, dtype=float) ** 2
+    centered = squared - squared.mean(axis=0) - squared.mean(axis=1)[:, np.newaxis] + squared.mean()
+    centered *= -0.5
+    axes = []
+    for _ in range(2):
+        vector = np.random.default_rng(0).random(len(centered)) - 0.5
+        value = 0.0
+        for _ in range(iterations):
+            for axis, _ in axes:
+                vector -= axis * (axis @ vector)
+            vector = centered @ vector
+            value = np.linalg.norm(vector)
+            if value == 0:
+                break
+            vector /= value
+        axes.append((vector, value))
+    return np.column_stack([vector * np.sqrt(max(value, 0.0)) for vector, value in axes])
+
+
+def space_filling_curve(distances, order=16):
+    """
+    Space-filling curve tour: visits the cities in the order of a Hilbert
+    curve through their coordinates. O(n log n). Distance tables without
+    coordinates are first laid out in the plane, see _embedding.
+    Args:
+        distances (2d-array): table over distances
+        order (int): resolution of the curve, 2**order cells along each side
+
+    Returns:
+        (np.array): the tour
+    """
+    if isinstance(distances, CoordinateDistances):
+        points = distances.coordinates[:, :2]
+    else:
+        points = _embedding(distances)
+    low, high = points.min(axis=0), points.max(axis=0)
+    scaled = (points - low) / np.where(high > low, high - low, 1) * ((1 << order) - 1)
+    x, y = scaled.astype(np.int64).T
+    return np.argsort(_hilbert_index(x, y, order), kind="stable")
+
+
+def _minimum_spanning_tree(distances):
+    """
+    Edges of a minimum spanning tree by Prim's algorithm, one row at a time
+    """
+    n = len(distances)
+    closest = _row(distances, 0)
+    parent = np.zeros(n, dtype=int)
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    edges = []
+    for _ in range(n - 1):
+        closest[in_tree] = np.inf
+        j = int(np.argmin(closest))
+        edges.append((int(parent[j]), j))
+        in_tree[j] = True
+        row = _row(distances, j)
+        closer = row < closest
+        closest[closer] = row[closer]
+        parent[closer] = j
+    return edges
+
+
+def christofides_lite(distances):
+    """
+    Christofides-like tour: a minimum spanning tree, plus a greedy matching
+    of its odd degree cities instead of a minimum weight one, walked as an
+    Euler circuit that skips cities already visited. O(n^2).
+    Args:
+        distances (2d-array): table over distances
+
+    Returns:
+        (np.array): the tour
+    """
+    n = len(distances)
+    edges = _minimum_spanning_tree(distances)
+    degree = np.bincount(np.array(edges, dtype=int).ravel(), minlength=n) if edges else np.zeros(n, dtype=int)
+
+    unmatched = list(np.flatnonzero(degree % 2 == 1))
+    while unmatched:
+        city = unmatched.pop(0)
+        gaps = np.asarray(distances[city, unmatched], dtype=float)
+        edges.append((city, unmatched.pop(int(np.argmin(gaps)))))
+
+    adjacent = [[] for _ in range(n)]
+    for i, j in edges:
+        adjacent[i].append(j)
+        adjacent[j].append(i)
+
+    # Hierholzer's algorithm, cities are added to the tour the first time they are reached
+    visited = np.zeros(n, dtype=bool)
+    tour = []
+    stack = [0]
+    while stack:
+        city = stack[-1]
+        if adjacent[city]:
+            nxt = adjacent[city].pop()
+            adjacent[nxt].remove(city)
+            stack.append(nxt)
+        else:
+            stack.pop()
+            if not visited[city]:
+                visited[city] = True
+                tour.append(city)
+    return np.array(tour[::-1])
+
+
+def seed_tours(size, distances, seeding, rng=None):
+    """
+    Builds tours with construction heuristics
+    Args:
+        size (int): Population size
+        distances (2d-array): table over distances
+        seeding (dict): Number of tours from each heuristic, a name in
+                        CONSTRUCTIONS or a function of distances. Counts
+                        below 1 are fractions of the population, others
+                        are rounded to whole tours. The deterministic
+                        heuristics give the same tour every time, so one
+                        of each is usually enough.
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        (2d-array): one tour per row, at most size of them
+    """
+    rng = np.random.default_rng(rng)
+    tours = []
+    for heuristic, count in seeding.items():
+        if isinstance(heuristic, str):
+            heuristic = CONSTRUCTIONS[heuristic]
+        count = int(round(count * size if count < 1 else count))
+        for _ in range(min(count, size - len(tours))):
+            tours.append(heuristic(distances, rng=rng) if heuristic in RANDOMIZED else heuristic(distances))
+    return np.array(tours, dtype=np.int32).reshape(len(tours), len(distances))
+
+
+# Heuristics that take an rng
+RANDOMIZED = (nearest_neighbor, randomized_nearest_neighbor)
+
+CONSTRUCTIONS = {
+    "nearest_neighbor": nearest_neighbor,
+    "randomized_nearest_neighbor": randomized_nearest_neighbor,
+    "greedy_edge": greedy_edge,
+    "space_filling_curve": space_filling_curve,
+    "christofides_lite": christofides_lite,
+}
@@ -0,0 +1,282 @@
+import numpy as np
+
+
+def _positions(tours):
+    """
+    Position lookup for a batch of tours, position[r, city] is the index of
+    city in tours[r]
+    """
+    rows = np.arange(len(tours))[:, np.newaxis]
+    position = np.empty_like(tours)
+    position[rows, tours] = np.arange(tours.shape[1])
+    return position
+
+
+def _segments(k, n, rng):
+    """
+    Random crossover segments of half the tour length, same as pmx_pair
+    """
+    start = rng.integers(0, max(n // 2, 1), size=k)
+    return start, start + n // 2
+
+
+def pmx_batch(a, b, start, stop):
+    """
+    Partial-mapped crossover of many pairs of parents at once. Conflicting
+    cities outside the segment are resolved through a position lookup of the
+    first parent, so each child costs O(n).
+    Args:
+        a (2d-array):     First parents, one per row
+        b (2d-array):     Second parents, one per row
+        start (np.array): Start index of each segment
+        stop (np.array):  End index of each segment
+
+    Returns:
+        2d-array with one child per row
+    """
+    a, b = np.asarray(a), np.asarray(b)
+    rows = np.arange(len(a))[:, np.newaxis]
+    cols = np.arange(a.shape[1])
+    segment = (cols >= start[:, np.newaxis]) & (cols < stop[:, np.newaxis])
+    position_a = _positions(a)
+    in_segment = segment[rows, position_a]  # in_segment[r, city]: city is in a's segment
+
+    child = np.where(segment, a, b)
+    r, c = np.nonzero(~segment & in_segment[rows, child])
+    while len(r):
+        # Follow the mapping a[i] -> b[i] until the city is free
+        child[r, c] = b[r, position_a[r, child[r, c]]]
+        free = ~in_segment[r, child[r, c]]
+        r, c = r[~free], c[~free]
+    return child
+
+
+def ox_batch(a, b, start, stop):
+    """
+    Order crossover of many pairs of parents at once. The child keeps the
+    segment of the first parent and the remaining cities in the order they
+    appear in the second parent, starting after the segment.
+    Args:
+        a (2d-array):     First parents, one per row
+        b (2d-array):     Second parents, one per row
+        start (np.array): Start index of each segment
+        stop (np.array):  End index of each segment
+
+    Returns:
+        2d-array with one child per row
+    """
+    a, b = np.asarray(a), np.asarray(b)
+    k, n = a.shape
+    rows = np.arange(k)[:, np.newaxis]
+    cols = np.arange(n)
+    segment = (cols >= start[:, np.newaxis]) & (cols < stop[:, np.newaxis])
+    in_segment = segment[rows, _positions(a)]
+
+    order = (stop[:, np.newaxis] + cols) % n
+    from_b = b[rows, order]
+    free = ~segment[rows, order]
+    child = np.where(segment, a, 0)
+    child[np.broadcast_to(rows, (k, n))[free], order[free]] = from_b[~in_segment[rows, from_b]]
+    return child
+
+
+def cx_batch(a, b):
+    """
+    Cycle crossover of many pairs of parents at once. Every city keeps the
+    position it has in one of the parents, alternating between the parents
+    for each cycle. Cycles are labelled by pointer doubling.
+    Args:
+        a (2d-array): First parents, one per row
+        b (2d-array): Second parents, one per row
+
+    Returns:
+        2d-array with one child per row
+    """
+    a, b = np.asarray(a), np.asarray(b)
+    n = a.shape[1]
+    cols = np.arange(n)
+    step = np.take_along_axis(_positions(a), b, axis=1)
+    label = np.broadcast_to(cols, a.shape).copy()
+    for _ in range(int(np.ceil(np.log2(max(n, 2))))):
+        label = np.minimum(label, np.take_along_axis(label, step, axis=1))
+        step = np.take_along_axis(step, step, axis=1)
+
+    cycle = np.cumsum(label == cols, axis=1) - 1
+    cycle = np.take_along_axis(cycle, label, axis=1)
+    return np.where(cycle % 2 == 0, a, b)
+
+
+def erx(a, b, rng=None):
+    """
+    Edge recombination crossover. Builds a child from the union of the
+    parents' edges, always moving on to the neighboring city with the fewest
+    remaining edges, and to a random unvisited city when there are none.
+    Args:
+        a (List): First parent
+        b (List): Second parent
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Permutation based on parents
+    """
+    a, b = np.asarray(a).tolist(), np.asarray(b).tolist()
+    n = len(a)
+    draws = np.random.default_rng(rng).random(n).tolist()
+    edges = [set() for _ in range(n)]
+    for tour in (a, b):
+        for i, city in enumerate(tour):
+            edges[city].update((tour[i - 1], tour[(i + 1) % n]))
+
+    unvisited = list(range(n))
+    index = list(range(n))
+    child = np.empty(n, dtype=np.int32)
+    current = a[0]
+    for k in range(n):
+        child[k] = current
+        last = unvisited.pop()
+        if last != current:
+            unvisited[index[current]] = last
+            index[last] = index[current]
+        for city in edges[current]:
+            edges[city].discard(current)
+        if edges[current]:
+            current = min(edges[current], key=lambda city: len(edges[city]))
+        elif unvisited:
+            current = unvisited[int(draws[k] * len(unvisited))]
+    return child
+
+
+def erx_batch(a, b, rng=None):
+    """
+    Edge recombination crossover of many pairs of parents, see erx
+    Args:
+        a (2d-array): First parents, one per row
+        b (2d-array): Second parents, one per row
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        2d-array with one child per row
+    """
+    rng = np.random.default_rng(rng)
+    return np.array([erx(x, y, rng) for x, y in zip(a, b)], dtype=np.int32).reshape(np.shape(a))
+
+
+def pmx(a, b, start, stop):
+    """
+    Partial-mapped crossover
+    Args:
+        a (List):    First parent
+        b (List):    Second parent
+        start (int): Start index
+        stop (int:   End index
+
+    Returns:
+        Permutation based on parents
+    """
+    return pmx_batch([a], [b], np.array([start]), np.array([stop]))[0]
+
+
+def ox(a, b, start, stop):
+    """
+    Order crossover
+    Args:
+        a (List):    First parent
+        b (List):    Second parent
+        start (int): Start index
+        stop (int:   End index
+
+    Returns:
+        Permutation based on parents
+    """
+    return ox_batch([a], [b], np.array([start]), np.array([stop]))[0]
+
+
+def cx(a, b):
+    """
+    Cycle crossover
+    Args:
+        a (List): First parent
+        b (List): Second parent
+
+    Returns:
+        Permutation based on parents
+    """
+    return cx_batch([a], [b])[0]
+
+
+def pmx_pair(a, b, rng=None):
+    """
+    Function that creates two children based on parents.
+    Args:
+        a (List):    First parent
+        b (List):    Second parent
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Tuple containing two children as a result of partially-mapped crossover
+    """
+    start = int(np.random.default_rng(rng).integers(0, len(a) // 2))
+    stop = start + len(a) // 2
+
+    return pmx(a, b, start, stop), pmx(b, a, start, stop)
+
+
+def _offspring(operator, parents, segmented, rng):
+    """
+    Pairs up parent 2i and 2i+1 and creates both of their children
+    """
+    parents = np.asarray(parents)
+    a, b = parents[0::2], parents[1::2]
+    first, second = np.concatenate((a, b)), np.concatenate((b, a))
+    if segmented:
+        start, stop = _segments(len(a), parents.shape[1], np.random.default_rng(rng))
+        children = operator(first, second, np.tile(start, 2), np.tile(stop, 2))
+    else:
+        children = operator(first, second)
+    offspring = np.empty_like(parents)
+    offspring[0::2], offspring[1::2] = children[:len(a)], children[len(a):]
+    return offspring
+
+
+def pmx_offspring(parents, rng=None):
+    """
+    Partially-mapped crossover for a whole generation. Parents 2i and 2i+1
+    create children 2i and 2i+1.
+    Args:
+        parents (2d-array): Selected parents, an even number of rows
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        2d-array of offspring
+    """
+    return _offspring(pmx_batch, parents, True, rng)
+
+
+def ox_offspring(parents, rng=None):
+    """
+    Order crossover for a whole generation, see pmx_offspring
+    """
+    return _offspring(ox_batch, parents, True, rng)
+
+
+def cx_offspring(parents, rng=None):
+    """
+    Cycle crossover for a whole generation, see pmx_offspring
+    """
+    return _offspring(cx_batch, parents, False, rng)
+
+
+def erx_offspring(parents, rng=None):
+    """
+    Edge recombination crossover for a whole generation, see pmx_offspring
+    """
+    rng = np.random.default_rng(rng)
+    return _offspring(lambda a, b: erx_batch(a, b, rng), parents, False, rng)
+
+
+CROSSOVERS = {
+    "pmx": pmx_offspring,
+    "ox": ox_offspring,
+    "cx": cx_offspring,
+    "erx": erx_offspring,
+}
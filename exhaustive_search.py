@@ -1,10 +1,18 @@
+import math
+import os
+import queue
+import multiprocessing
 import numpy as np
-from itertools import permutations
+from itertools import permutations, islice
+from concurrent.futures import ProcessPoolExecutor, wait
 import time
 from general_tools import *
 
+# State of a search worker, set by _init_search
+_search = {}
 
-def exhaustive_search(cities, distances):
+
+def exhaustive_search(cities, distances, chunk_size=10000):
     """
     Runs an exhaustive search to find the best solution of TSP on the given 
     cities. Finds permutation from 1 to the number of cities and adds 0 in front
@@ -13,6 +21,7 @@ def exhaustive_search(cities, distances):
     Args:
         cities: list of cities to solve
         distances (2d-list): table over distances
+        chunk_size (int): how many permutations to measure at once
 
     Returns:
         Tuple containing the cities in the shortest order and the
@@ -20,15 +29,401 @@ def exhaustive_search(cities, distances):
     """
     shortest_dist = float("inf")
     best = None
-    for comb in permutations(range(1, len(cities))):
-        permutation = (0,) + comb
-        dist = measure_distance(permutation, distances)
-        if dist < shortest_dist:
-            shortest_dist = dist
-            best = permutation
+    tours = permutations(range(1, len(cities)))
+    chunk = list(islice(tours, chunk_size))
+    while chunk:
+        batch = np.zeros((len(chunk), len(cities)), dtype=int)
+        batch[:, 1:] = chunk
+        dists = measure_distances(batch, distances)
+        i = np.argmin(dists)
+        if dists[i] < shortest_dist:
+            shortest_dist = dists[i]
+            best = batch[i]
+        chunk = list(islice(tours, chunk_size))
     return [cities[i] for i in best], shortest_dist
 
 
+def _reconstruct(cities, tour, distances):
+    tour = [0] + [int(city) for city in tour]
+    return [cities[i] for i in tour], measure_distance(tour, distances)
+
+
+def held_karp(cities, distances):
+    """
+    Exact solver based on the Held-Karp dynamic program. best[mask, j] is the
+    shortest path that starts in city 0, visits the cities in mask and ends in
+    city j. The subsets are handled one size at a time, vectorized over all
+    subsets of that size. Uses O(n*2^n) time and memory, about 100 MB for 20
+    cities, see held_karp_layered for a leaner variant.
+
+    Args:
+        cities: list of cities to solve
+        distances (2d-list): table over distances
+
+    Returns:
+        Tuple containing the cities in the shortest order and the
+        tours distance.
+    """
+    distances = np.asarray(distances, dtype=float)
+    m = len(cities) - 1  # City 0 is fixed as start, masks cover the rest
+    if m < 3:
+        return _reconstruct(cities, range(1, m + 1), distances)
+
+    inner = distances[1:, 1:]
+    masks = np.arange(1 << m)
+    size = sum((masks >> bit) & 1 for bit in range(m))
+    best = np.full((1 << m, m), np.inf)
+    parent = np.zeros((1 << m, m), dtype=np.uint8)
+    best[1 << np.arange(m), np.arange(m)] = distances[0, 1:]
+
+    for k in range(2, m + 1):
+        layer = masks[size == k]
+        for j in range(m):
+            with_j = layer[(layer >> j) & 1 == 1]
+            cost = best[with_j ^ (1 << j)] + inner[:, j]
+            parent[with_j, j] = np.argmin(cost, axis=1)
+            best[with_j, j] = cost[np.arange(len(with_j)), parent[with_j, j]]
+
+    mask = (1 << m) - 1
+    j = int(np.argmin(best[mask] + distances[1:, 0]))
+    tour = []
+    while mask:
+        tour.append(j + 1)
+        mask, j = mask ^ (1 << j), int(parent[mask, j])
+    return _reconstruct(cities, tour[::-1], distances)
+
+
+def held_karp_layered(cities, distances):
+    """
+    Memory-bounded variant of held_karp. Only stores the subsets of one size
+    at a time, each with the distances of its own members, and keeps the
+    values of the previous size only. For every state only the one byte
+    parent pointer is kept, so 24 cities need about 1 GB instead of 4 GB.
+
+    Args:
+        cities: list of cities to solve
+        distances (2d-list): table over distances
+
+    Returns:
+        Tuple containing the cities in the shortest order and the
+        tours distance.
+    """
+    distances = np.asarray(distances, dtype=float)
+    m = len(cities) - 1
+    if m < 3:
+        return _reconstruct(cities, range(1, m + 1), distances)
+
+    inner = distances[1:, 1:]
+    bit_range = np.arange(m, dtype=np.int32)
+    masks = np.arange(1 << m, dtype=np.int32)
+    size = sum(((masks >> bit) & 1).astype(np.uint8) for bit in range(m))
+
+    layers = [None, 1 << bit_range]
+    parents = [None, np.zeros((m, 1), dtype=np.uint8)]
+    members = bit_range[:, np.newaxis].astype(np.uint8)  # Cities in each subset, ascending
+    best = distances[0, 1:, np.newaxis]                   # Shortest path ending in each member
+
+    for k in range(2, m + 1):
+        layer = masks[size == k]
+        bits = ((layer[:, np.newaxis] >> bit_range) & 1).astype(np.uint8)
+        rank = np.cumsum(bits, axis=1, dtype=np.uint8) - bits
+        layer_best = np.empty((len(layer), k))
+        layer_parent = np.empty((len(layer), k), dtype=np.uint8)
+        for j in range(m):
+            with_j = np.nonzero(bits[:, j])[0]
+            row = np.searchsorted(layers[-1], layer[with_j] ^ (1 << j))
+            cost = best[row] + inner[members[row], j]
+            arg = np.argmin(cost, axis=1)
+            layer_best[with_j, rank[with_j, j]] = cost[np.arange(len(row)), arg]
+            layer_parent[with_j, rank[with_j, j]] = members[row, arg]
+        members = np.nonzero(bits)[1].reshape(len(layer), k).astype(np.uint8)
+        best = layer_best
+        layers.append(layer)
+        parents.append(layer_parent)
+
+    mask = (1 << m) - 1
+    j = int(np.argmin(best[0] + distances[1:, 0]))
+    tour = []
+    for k in range(m, 0, -1):
+        tour.append(j + 1)
+        row = np.searchsorted(layers[k], mask)
+        rank = bin(mask & ((1 << j) - 1)).count("1")
+        mask, j = mask ^ (1 << j), int(parents[k][row, rank])
+    return _reconstruct(cities, tour[::-1], distances)
+
+
+def _spanning_tree(distances, nodes):
+    """
+    Minimum spanning tree over the given nodes by Prim's algorithm
+
+    Returns:
+        Tuple containing the cost of the tree and the degree of each node
+    """
+    sub = distances[np.ix_(nodes, nodes)]
+    closest = sub[0].copy()
+    parent = np.zeros(len(nodes), dtype=int)
+    degree = np.zeros(len(nodes), dtype=int)
+    in_tree = np.zeros(len(nodes), dtype=bool)
+    in_tree[0] = True
+    cost = 0.0
+    for _ in range(len(nodes) - 1):
+        closest[in_tree] = np.inf
+        j = np.argmin(closest)
+        cost += closest[j]
+        degree[j] += 1
+        degree[parent[j]] += 1
+        in_tree[j] = True
+        closer = sub[j] < closest
+        closest[closer] = sub[j][closer]
+        parent[closer] = j
+    return cost, degree
+
+
+def one_tree_penalties(distances, iterations=100):
+    """
+    Node penalties for the Held-Karp 1-tree bound. A 1-tree is a minimum
+    spanning tree over cities 1..n-1 plus the two shortest edges of city 0,
+    and every tour is a 1-tree. Subgradient steps raise the penalty of
+    cities with degree above two and lower it below two, which pushes the
+    1-tree towards a tour and tightens the bound.
+
+    Args:
+        distances (2d-array): table over distances
+        iterations (int): number of subgradient steps
+
+    Returns:
+        Tuple containing the penalties and the best lower bound found
+    """
+    n = len(distances)
+    penalties = np.zeros(n)
+    best_penalties, bound = penalties, -np.inf
+    step = np.mean(distances) / n
+    for _ in range(iterations):
+        modified = distances + penalties[:, np.newaxis] + penalties
+        cost, degree = _spanning_tree(modified, np.arange(1, n))
+        to_start = np.argsort(modified[0, 1:])[:2]
+        degree[to_start] += 1
+        degree = np.append(2, degree)
+        value = cost + modified[0, 1:][to_start].sum() - 2 * penalties.sum()
+        if value > bound:
+            best_penalties, bound = penalties.copy(), value
+        if np.all(degree == 2):
+            break
+        penalties = penalties + step * (degree - 2)
+        step *= 0.95
+    return best_penalties, bound
+
+
+def branch_and_bound(cities, distances):
+    """
+    Exact solver that grows tours from city 0 depth first, trying the closest
+    cities first, and prunes every partial tour whose lower bound is no better
+    than the best tour found. The bound is a 1-tree bound with Held-Karp node
+    penalties: the length of the partial tour, plus a minimum spanning tree
+    over its last city and the unvisited cities, plus the shortest edge back
+    to city 0. Starts from a 2-opt local optimum as the first upper bound.
+    The spanning tree ignores the direction of the edges, so it is no bound
+    on asymmetric tables, which are solved by held_karp_layered instead.
+
+    Args:
+        cities: list of cities to solve
+        distances (2d-list): table over distances
+
+    Returns:
+        Tuple containing the cities in the shortest order and the
+        tours distance.
+    """
+    from local_search import local_search
+
+    distances = np.asarray(distances, dtype=float)
+    n = len(cities)
+    if n < 4:
+        return _reconstruct(cities, range(1, n), distances)
+    if not is_symmetric(distances):
+        return held_karp_layered(cities, distances)
+
+    tour, shortest_dist = local_search(np.arange(n), distances, "2opt", "best")
+    best = [np.roll(tour, -int(np.argmax(tour == 0))).tolist(), shortest_dist]
+    penalties, _ = one_tree_penalties(distances)
+    modified = distances + penalties[:, np.newaxis] + penalties
+    bounds = {}
+
+    def visit(path, visited, cost):
+        last = path[-1]
+        if len(path) == n:
+            if cost + distances[last, 0] < best[1]:
+                best[:] = [list(path), cost + distances[last, 0]]
+            return
+        remaining = np.nonzero(~visited)[0]
+        key = (last, visited.tobytes())
+        if key not in bounds:
+            # Lower bound on the rest of the tour, from last through remaining back to 0
+            bounds[key] = _spanning_tree(modified, np.append(last, remaining))[0] + \
+                np.min(modified[remaining, 0]) - penalties[last] - penalties[0] - 2 * penalties[remaining].sum()
+        if cost + bounds[key] >= best[1] - 1e-9:
+            return
+        for city in remaining[np.argsort(distances[last, remaining])]:
+            visited[city] = True
+            path.append(city)
+            visit(path, visited, cost + distances[last, city])
+            path.pop()
+            visited[city] = False
+
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    visit([0], visited, 0.0)
+    return _reconstruct(cities, best[0][1:], distances)
+
+
+def _init_search(rows, bound, lock, messages):
+    _search.update(rows=rows, bound=bound, lock=lock, messages=messages,
+                   min_in=[min(row[:i] + row[i + 1:]) for i, row in enumerate(zip(*rows))])
+
+
+def _search_prefix(prefix, report_every=1.0):
+    """
+    Searches all tours that start with city 0 followed by prefix. Tours are
+    grown depth first with their distance summed incrementally, and a branch
+    is cut when its distance plus the cheapest edge into each city still to
+    be entered is no better than the shared best bound.
+
+    Returns:
+        Tuple containing the best tour found and its distance, or None
+    """
+    rows, shared, lock, messages, min_in = (_search[key] for key in ("rows", "bound", "lock", "messages", "min_in"))
+    n = len(rows)
+    remaining = [city for city in range(1, n) if city not in prefix]
+    path = [0] + list(prefix)
+    cost = sum(rows[a][b] for a, b in zip(path, path[1:]))
+    lower = min_in[0] + sum(min_in[city] for city in remaining)
+    state = {"bound": shared.value, "best": None, "examined": 0, "reported": 0, "time": time.time()}
+
+    def report(done=False):
+        messages.put((state["examined"] - state["reported"], state["bound"], done))
+        state["reported"] = state["examined"]
+        state["time"] = time.time()
+
+    def visit(depth, last, cost, lower):
+        if depth == len(remaining):
+            state["examined"] += 1
+            total = cost + rows[last][0]
+            if total < state["bound"]:
+                with lock:
+                    if total < shared.value:
+                        shared.value = total
+                        state["best"] = (path + remaining, total)
+                state["bound"] = shared.value
+            if state["examined"] % 4096 == 0:
+                state["bound"] = min(state["bound"], shared.value)
+                if time.time() - state["time"] > report_every:
+                    report()
+            return
+        for k in range(depth, len(remaining)):
+            remaining[depth], remaining[k] = remaining[k], remaining[depth]
+            city = remaining[depth]
+            step = cost + rows[last][city]
+            if step + lower - min_in[city] < state["bound"]:
+                visit(depth + 1, city, step, lower - min_in[city])
+            remaining[depth], remaining[k] = remaining[k], remaining[depth]
+
+    if cost + lower < state["bound"]:
+        visit(0, path[-1], cost, lower)
+    report(done=True)
+    return state["best"]
+
+
+def parallel_exhaustive_search(cities, distances, workers=None, prefix_length=2, progress=None, report_every=1.0):
+    """
+    Exhaustive search where the tours are split by their first cities after
+    city 0 and the prefixes are searched on a pool of worker processes. The
+    workers grow tours incrementally and prune branches that can't beat the
+    best tour found by any worker, which they share through shared memory.
+    The search starts from the bound of a nearest neighbor tour improved by
+    swaps.
+
+    Args:
+        cities: list of cities to solve
+        distances (2d-list): table over distances
+        workers (int): Number of processes, defaults to one per core
+        prefix_length (int): Number of fixed cities per task
+        progress: Function called as progress(examined, tours_per_second, best)
+                  while the search runs
+        report_every (float): Seconds between progress reports of a worker
+
+    Returns:
+        Tuple containing the cities in the shortest order and the
+        tours distance.
+    """
+    from construction import nearest_neighbor
+    from local_search import local_search
+
+    distances = np.asarray(distances, dtype=float)
+    n = len(cities)
+    if n < 4:
+        return _reconstruct(cities, range(1, n), distances)
+
+    tour, shortest_dist = local_search(nearest_neighbor(distances, start=0), distances, "swap", "best")
+    best = (np.roll(tour, -int(np.argmax(tour == 0))).tolist(), shortest_dist)
+    bound = multiprocessing.Value("d", shortest_dist + 1e-9, lock=False)
+    lock = multiprocessing.Lock()
+    messages = multiprocessing.Queue()
+    init_args = (distances.tolist(), bound, lock, messages)
+    prefixes = list(permutations(range(1, n), min(prefix_length, n - 2)))
+    workers = min(workers or os.cpu_count(), len(prefixes))
+
+    examined, finished = 0, 0
+    start = time.time()
+
+    def drain(timeout=None):
+        # Reads the reports of the workers, waiting up to timeout seconds for the first one
+        nonlocal examined, finished
+        try:
+            message = messages.get(timeout=timeout) if timeout else messages.get_nowait()
+            while True:
+                examined += message[0]
+                finished += message[2]
+                message = messages.get_nowait()
+        except queue.Empty:
+            pass
+        if progress is not None:
+            progress(examined, examined / max(time.time() - start, 1e-9), bound.value)
+
+    if workers <= 1:
+        _init_search(*init_args)
+        found = []
+        for prefix in prefixes:
+            found.append(_search_prefix(prefix, report_every))
+            drain()
+    else:
+        pool = ProcessPoolExecutor(workers, initializer=_init_search, initargs=init_args)
+        try:
+            pending = [pool.submit(_search_prefix, prefix, report_every) for prefix in prefixes]
+            futures = list(pending)
+            while pending:
+                _, pending = wait(pending, timeout=report_every)
+                drain()
+            found = [future.result() for future in futures]
+        finally:
+            pool.shutdown(cancel_futures=True)
+    # Every task reports when it is done, the last reports can still be on their way
+    while finished < len(prefixes):
+        drain(report_every)
+
+    for result in found:
+        if result is not None and result[1] < best[1]:
+            best = result
+    return _reconstruct(cities, best[0][1:], distances)
+
+
+EXACT_SOLVERS = {
+    "permutations": exhaustive_search,
+    "held_karp": held_karp,
+    "held_karp_layered": held_karp_layered,
+    "branch_and_bound": branch_and_bound,
+    "parallel": parallel_exhaustive_search,
+}
+
+
 def main():
     cities, distances = read_file("european_cities.csv")
     sub_cities = cities[0:10]
@@ -42,12 +437,19 @@ def main():
     print(f"Time to calculate:                             {search_time} s")
 
     # Calculate time for all cities:
-    fac_10 = np.math.factorial(10)
-    fac_24 = np.math.factorial(24)
+    fac_10 = math.factorial(10)
+    fac_24 = math.factorial(24)
     
     time_to_calculate_24 = search_time * fac_24 / fac_10
     print(f"Estimated time for all based on time for 10:   {time_to_calculate_24} s")
 
+    # Exact solution for all cities:
+    start = time.time()
+    tour, distance = branch_and_bound(cities, distances)
+    print(f"\nShortest tour of all:                          {' -> '.join(tour)} ->")
+    print(f"Distance :                                     {distance}")
+    print(f"Time with branch and bound:                    {time.time() - start} s")
+
 
 if __name__ == '__main__':
     main()
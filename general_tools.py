@@ -1,5 +1,13 @@
+import weakref
 import numpy as np
 
+__all__ = ["read_file", "measure_distance", "measure_distances", "is_symmetric", "Population", "get_best",
+           "average_dist"]
+
+# Symmetry of the distance tables checked so far, by id, with a weak reference that tells a table apart from a
+# later one that got the same id
+_symmetric = {}
+
 
 def read_file(csv_file):
     """
@@ -10,8 +18,9 @@ def read_file(csv_file):
     Returns:
         Tuple containing names of cities and np.array of distances
     """
-    cities = np.genfromtxt(csv_file, max_rows=1, dtype=str, delimiter=";")
-    distances = np.genfromtxt(csv_file, skip_header=True, dtype=float, delimiter=";")
+    with open(csv_file) as f:
+        cities = np.array(f.readline().rstrip("\n").split(";"))
+        distances = np.loadtxt(f, dtype=float, delimiter=";", ndmin=2)
     return cities, distances
 
 
@@ -25,70 +34,119 @@ def measure_distance(permutation, distances):
     Returns:
         (int): distance
     """
-    distance = 0
-    prev = permutation[-1]
-    for i in permutation:
-        distance += distances[prev][i]
-        prev = i
-    return distance
+    return measure_distances([permutation], distances)[0]
+
+
+def measure_distances(tours, distances):
+    """
+    Measures the distance of every tour in a population at once. Gathers the
+    edge lengths of all tours from the distance table and sums them row-wise.
+    Args:
+        tours (2d-array): one permutation per row, all of the same length
+        distances (2d-array): table over distances between cities, anything
+                              that supports distances[rows, cols] indexing.
+                              Sums are taken in float64 also for float32 tables.
+
+    Returns:
+        (np.array): distance of each tour
+    """
+    tours = np.asarray(tours, dtype=np.intp)
+    if isinstance(distances, list):
+        distances = np.asarray(distances)
+    return distances[np.roll(tours, 1, axis=1), tours].sum(axis=1, dtype=np.float64)
+
+
+def is_symmetric(distances, block=1024):
+    """
+    Checks whether the distance from i to j is the distance from j to i for
+    all cities. Deltas of moves that reverse part of a tour only need the
+    edges at its ends when it is. The answer is remembered for each table, so
+    checking the same table again is free, and tables that know the answer,
+    like instances.CoordinateDistances, say so in their symmetric attribute.
+    Args:
+        distances (2d-array): table over distances between cities
+        block (int): rows compared at a time, keeps memory-mapped tables on disk
+
+    Returns:
+        (bool): whether the table is symmetric
+    """
+    if hasattr(distances, "symmetric"):
+        return distances.symmetric
+    known = _symmetric.get(id(distances))
+    if known is not None and known[0]() is distances:
+        return known[1]
+
+    matrix = np.asarray(distances)
+    symmetric = all(np.allclose(matrix[start:start + block], matrix[:, start:start + block].T)
+                    for start in range(0, len(matrix), block))
+    try:
+        key = id(distances)
+        _symmetric[key] = (weakref.ref(distances, lambda _: _symmetric.pop(key, None)), symmetric)
+    except TypeError:
+        # Lists can't be referenced weakly, they are checked every time
+        pass
+    return symmetric
+
+
+class Population:
+    """
+    A population stored as a contiguous int32 tour matrix with one
+    permutation per row, and a float64 vector with the distance of each tour.
+    Selection and survivor selection work on index arrays into it.
+    Args:
+        tours (2d-array): one permutation per row
+        fitness (np.array): distance of each tour
+    """
+
+    def __init__(self, tours, fitness):
+        self.tours = np.ascontiguousarray(tours, dtype=np.int32)
+        self.fitness = np.ascontiguousarray(fitness, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.fitness)
+
+    def take(self, indices):
+        """
+        Args:
+            indices (np.array): indices of the individuals to keep
+
+        Returns:
+            New population containing only the given individuals
+        """
+        return Population(self.tours[indices], self.fitness[indices])
+
+    def extend(self, other):
+        """
+        Args:
+            other (Population): individuals to add
+
+        Returns:
+            New population containing the individuals of both populations
+        """
+        return Population(np.concatenate((self.tours, other.tours)),
+                          np.concatenate((self.fitness, other.fitness)))
 
 
 def get_best(population):
     """
     Function that finds the tour with the shortest distance
     Args:
-        population (List): containing permutations and their distances
+        population (Population): containing permutations and their distances
 
     Returns:
         Tuple containing shortest tour, and its distance
     """
-    best = None
-    best_dist = float("inf")
-    for tour, dist in population:
-        if dist < best_dist:
-            best = tour
-            best_dist = dist
-    return best, best_dist
+    i = np.argmin(population.fitness)
+    return population.tours[i], population.fitness[i]
 
 
 def average_dist(population):
     """
     Function that calculates the average distance in a population
     Args:
-        population: List
+        population (Population)
 
     Returns:
         Average distance of the individuals in the population
     """
-    return np.average([i[1] for i in population])
-
-
-def print_info(results, total_dist, number_of_runs):
-    """
-    Prints out info based on results
-    Args:
-        results (List): Containing results of runs, (tour, distance)
-        total_dist (float): Sum of all distances
-        number_of_runs (int): How many times the algorithm ran
-    """
-    average = total_dist / number_of_runs
-    std = np.std([tup[1] for tup in results])
-
-    best_dist = float("inf")
-    worst_dist = 0
-    best_tour = worst_tour = None
-
-    for tour, dist in results:
-        if dist < best_dist:
-            best_tour = tour
-            best_dist = dist
-        elif dist > worst_dist:
-            worst_tour = tour
-            worst_dist = dist
-
-    print(f"\nBest:                {'->'.join(best_tour)}")
-    print(f"Best distance:       {best_dist}")
-    print(f"\nWorst:               {'->'.join(worst_tour)}")
-    print(f"Worst distance:      {worst_dist}")
-    print(f"\nAverage distance:    {average}")
-    print(f"Standard deviation:  {std}")
+    return np.average(population.fitness)
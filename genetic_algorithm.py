@@ -1,236 +1,379 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import random
-import time
+import functools
+import os
 from general_tools import *
+from crossover import CROSSOVERS, pmx_offspring
+from mutation import MUTATIONS, insert_mutation_batch
+from tour_cache import unique_tours
+from construction import seed_tours
+from stopping import GENERATIONS
+from checkpoint import save_checkpoint, load_checkpoint, warm_start_population
+from instrumentation import no_phase
 
+__all__ = ["initiate_population", "tournament_selection", "ranked_selection", "stochastic_universal_sampling",
+           "boltzmann_selection", "SELECTIONS", "survivor_selection", "insert_mutation", "next_generation",
+           "genetic_algorithm"]
 
-def initiate_population(size, cities, distances):
+
+def initiate_population(size, cities, distances, seeding=None, rng=None):
     """
-    Function that generates a random population
+    Function that generates a random population, optionally seeded with
+    tours from construction heuristics
     Args:
         size (int): Population size
         cities: Array of all cities to visit
         distances (2d-array): table over distances
+        seeding (dict): Number of individuals from each construction
+                        heuristic, e.g. {"greedy_edge": 1,
+                        "randomized_nearest_neighbor": 0.2}, see
+                        construction.seed_tours. The rest are random.
+        rng (np.random.Generator): random number generator, or a seed
 
     Returns:
-        List of tuples containing the random individuals and their distance
+        Population of random individuals and their distance
     """
-    permutations = [list(np.random.permutation(len(cities))) for _ in range(size)]
-    return [(tour, measure_distance(tour, distances)) for tour in permutations]
+    rng = np.random.default_rng(rng)
+    seeded = seed_tours(size, distances, seeding or {}, rng)
+    permutations = rng.permuted(np.tile(np.arange(len(cities)), (size - len(seeded), 1)), axis=1)
+    permutations = np.concatenate((seeded, permutations))
+    return Population(permutations, measure_distances(permutations, distances))
 
 
-def tournament_selection(population, pop_size, tournament_size=0):
+def tournament_selection(population, pop_size, tournament_size=0, rng=None):
     """
-    Function that performs a tournament selection on the population. Creates
-    tournaments of given size and adds the winner of the tournaments in a list.
+    Function that performs a tournament selection on the population. All
+    tournaments are drawn at once as a (pop_size, tournament_size) matrix of
+    indices, and the winner of each row is the one with the shortest tour.
     Args:
-        population (list)
-        pop_size (int): Population size
+        population (Population)
+        pop_size (int): Number of parents to choose
         tournament_size (int): Size of each tournament
+        rng (np.random.Generator): random number generator, or a seed
 
     Returns:
-        A list with length pop_size containing all the chosen parents
+        Array with length pop_size containing the indices of the chosen parents
     """
-    selected = []
+    rng = np.random.default_rng(rng)
     if tournament_size == 0:
-        tournament_size = pop_size // 5  # If size of tournament isn't given it's set to 20% of population size
+        tournament_size = max(len(population) // 5, 1)  # If size of tournament isn't given it's set to 20% of population size
+
+    tournaments = rng.integers(len(population), size=(pop_size, tournament_size))
+    winners = np.argmin(population.fitness[tournaments], axis=1)
+    return tournaments[np.arange(pop_size), winners]
 
-    for i in range(pop_size):
-        tournament = [population[np.random.randint(pop_size)] for _ in range(tournament_size)]
-        selected.append(get_best(tournament))
 
-    return selected
+@functools.lru_cache(maxsize=None)
+def _rank_weights(size):
+    """
+    Cumulative chance of being chosen by ranked selection for each rank, the
+    shortest tour has rank size - 1 and the longest rank 0
+    """
+    ranks = np.arange(size)
+    return np.cumsum(ranks / ranks.sum())
+
+
+def _sample(cumulative, pop_size, rng, universal=False):
+    """
+    Draws pop_size indices from cumulative chances, with independent draws
+    or with evenly spaced pointers as in stochastic universal sampling
+    """
+    if universal:
+        points = (rng.random() + np.arange(pop_size)) / pop_size
+    else:
+        points = rng.random(pop_size)
+    chosen = np.searchsorted(cumulative, points * cumulative[-1], side="right")
+    return np.minimum(chosen, len(cumulative) - 1)
 
 
-def ranked_selection(population, pop_size):
+def ranked_selection(population, pop_size, rng=None):
     """
     Function that performs a ranked selection on a population. Gives each
     individual a rank based on fitness and normalizes that rank to choose
     parents for the next generation.
     Args:
-        population (list)
+        population (Population)
         pop_size (int): Population size
+        rng (np.random.Generator): random number generator, or a seed
 
     Returns:
-        A list with length pop_size containing all the chosen parents
+        Array with length pop_size containing the indices of the chosen parents
     """
-    sorted_pop = sorted(population, key=lambda tup: tup[1], reverse=True)
-    ranks = [i for i in range(pop_size)]
-    sum_ranks = sum(ranks)
-    chances = [i/sum_ranks for i in ranks]
+    sorted_pop = np.argsort(population.fitness)[::-1]
+    return sorted_pop[_sample(_rank_weights(len(population)), pop_size, np.random.default_rng(rng))]
 
-    return [sorted_pop[i] for i in np.random.choice(ranks, pop_size, p=chances)]
 
-
-def survivor_selection(population, pop_size):
+def stochastic_universal_sampling(population, pop_size, rng=None):
     """
-    Function that chooses the survivors of this generation, based on
-    (µ+λ)-selection.
-    
+    Function that chooses parents with the chances of ranked selection, but
+    with pop_size evenly spaced pointers from one random draw, so every
+    individual is chosen close to its expected number of times
     Args:
-        population (list)
+        population (Population)
         pop_size (int): Population size
 
     Returns:
-        List of survivors
+        Array with length pop_size containing the indices of the chosen parents,
+        in random order
     """
-    population.sort(key=lambda tup: tup[1])
-    return population[:pop_size]
+    rng = np.random.default_rng(rng)
+    sorted_pop = np.argsort(population.fitness)[::-1]
+    return rng.permutation(sorted_pop[_sample(_rank_weights(len(population)), pop_size, rng, True)])
 
 
-def pmx(a, b, start, stop):
+def boltzmann_selection(population, pop_size, temperature=1.0, rng=None):
     """
-    Partial-mapped crossover
+    Function that chooses parents with chances proportional to
+    exp(-(distance - shortest) / (temperature * standard deviation)), so a
+    low temperature favours the shortest tours more strongly
     Args:
-        a (List):    First parent
-        b (List):    Second parent
-        start (int): Start index
-        stop (int:   End index
+        population (Population)
+        pop_size (int): Population size
+        temperature (float)
+        rng (np.random.Generator): random number generator, or a seed
 
     Returns:
-        Permutation based on parents
+        Array with length pop_size containing the indices of the chosen parents
     """
-    child = [None] * len(a)
-    child[start:stop] = a[start:stop]
+    rng = np.random.default_rng(rng)
+    fitness = population.fitness
+    scale = temperature * fitness.std()
+    if scale == 0:
+        return rng.integers(len(population), size=pop_size)
+    return _sample(np.cumsum(np.exp(-(fitness - fitness.min()) / scale)), pop_size, rng)
 
-    for i, x in enumerate(b[start:stop], start):
-        if x not in child:
-            while child[i] is not None:
-                i = b.index(a[i])
-            child[i] = x
 
-    for i in range(len(child)):
-        if child[i] is None:
-            child[i] = b[i]
+SELECTIONS = {
+    "tournament": tournament_selection,
+    "ranked": ranked_selection,
+    "sus": stochastic_universal_sampling,
+    "boltzmann": boltzmann_selection,
+}
 
-    return child
 
-
-def pmx_pair(a, b):
+def survivor_selection(population, pop_size, unique=False):
     """
-    Function that creates two children based on parents.
+    Function that chooses the survivors of this generation, based on
+    (µ+λ)-selection. Only partitions the population around the pop_size
+    shortest tours instead of sorting all of it.
+
     Args:
-        a (List):    First parent
-        b (List):    Second parent
+        population (Population)
+        pop_size (int): Population size
+        unique (bool): Keep only one copy of each tour, rotated and reversed
+                       copies included. The best copies fill up the
+                       population if there are too few distinct tours.
 
     Returns:
-        Tuple containing two children as a result of partially-mapped crossover
+        Population of survivors
     """
-    start = np.random.randint(0, len(a) // 2)
-    stop = start + len(a) // 2
-
-    return pmx(a, b, start, stop), pmx(b, a, start, stop)
-
-
-def insert_mutation(permutation):
+    if len(population) <= pop_size:
+        return population
+    if unique:
+        first = unique_tours(population.tours)
+        if len(first) < pop_size:
+            copies = np.setdiff1d(np.arange(len(population)), first)
+            copies = copies[np.argsort(population.fitness[copies])[:pop_size - len(first)]]
+            return population.take(np.concatenate((first, copies)))
+        population = population.take(first)
+    return population.take(np.argpartition(population.fitness, pop_size - 1)[:pop_size])
+
+
+def insert_mutation(permutation, rng=None):
     """
     Function that mutates a given permutation using insertion
     Args:
-        permutation (list):
+        permutation (np.array): mutated in place
+        rng (np.random.Generator): random number generator, or a seed
 
     Returns:
         Mutated permutation where one value is moved to a different index
     """
-    i, j = np.random.choice(len(permutation), 2, replace=False)
-    permutation.insert(i + 1, permutation.pop(j))
+    i, j = np.random.default_rng(rng).choice(len(permutation), 2, replace=False)
+    if j > i:
+        permutation[i + 1:j + 1] = np.roll(permutation[i + 1:j + 1], 1)
+    else:
+        permutation[j:i + 2] = np.roll(permutation[j:i + 2], -1)
 
     return permutation
 
 
-def genetic_algorithm(cities, distances, pop_size, p_mutation, num_gens):
+def next_generation(population, distances, pop_size, p_mutation, crossover=pmx_offspring, monitor=None,
+                    mutation=insert_mutation_batch, cache=None, unique=False, selection=ranked_selection,
+                    rng=None):
     """
-    Implementation of a genetic algorithm to solve TSP.
-    Uses ranked- or tournament-selection for parent-selection. Partially-mapped
-    crossover for crossover. Insert-mutation for mutation and (µ+λ)-selection
-    for survival selection.
+    Function that evolves a population by one generation: parent selection,
+    crossover, mutation and survivor selection. Offspring are measured right
+    after crossover, mutation then only adds the change in distance of the
+    edges it touches.
     Args:
-        cities:              List of all cities to visit
+        population (Population)
         distances (2d-list): Table over distances
         pop_size (int):      Population size, should be an even number
         p_mutation (float):  Chance of mutation
-        num_gens (int):      Number of generations before termination
+        crossover:           Function creating a generation of offspring from
+                             the selected parents
+        monitor:             GenerationMonitor timing each phase, or None
+        mutation:            Batch mutation operator from mutation
+        cache (FitnessCache): Remembers distances of offspring seen before
+        unique (bool):       Remove duplicate tours in survivor selection
+        selection:           Parent selection, a function from SELECTIONS
+        rng (np.random.Generator): random number generator, or a seed
 
     Returns:
-        A tuple containing the best individual of the last generation and the
-        shortest distance of each generation
+        Population of the next generation
+    """
+    rng = np.random.default_rng(rng)
+    phase = no_phase if monitor is None else monitor.phase
+
+    with phase("selection"):
+        parents = population.tours[selection(population, pop_size, rng=rng)]
+    with phase("crossover"):
+        offspring = crossover(parents, rng=rng)
+    with phase("evaluation"):
+        if cache is None:
+            fitness = measure_distances(offspring, distances)
+        else:
+            fitness = cache.measure(offspring, distances)
+
+    with phase("mutation"):
+        mutate = rng.random(len(offspring)) < p_mutation
+        if mutate.any():
+            offspring[mutate], delta = mutation(offspring[mutate], distances, rng=rng)
+            fitness[mutate] += delta
+        population = population.extend(Population(offspring, fitness))
+
+    with phase("survivor_selection"):
+        return survivor_selection(population, pop_size, unique)
+
+
+def genetic_algorithm(cities, distances, pop_size, p_mutation, num_gens, crossover=pmx_offspring,
+                      islands=1, migration_interval=10, migrants=1, topology="ring", monitor=None,
+                      mutation=insert_mutation_batch, cache=None, unique=False, seeding=None, stop=None,
+                      checkpoint=None, checkpoint_interval=10, resume=False, warm_start=None,
+                      selection=ranked_selection, rng=None):
+    """
+    Implementation of a genetic algorithm to solve TSP.
+    Uses ranked-selection, or any other operator from SELECTIONS, for parent-selection. Partially-mapped
+    crossover, or any other operator from crossover, for crossover.
+    Insert-mutation for mutation and (µ+λ)-selection for survival selection.
+    With more than one island the population is split into subpopulations
+    that evolve in their own processes and exchange their best individuals,
+    see island_model.
+    Args:
+        cities:                   List of all cities to visit
+        distances (2d-list):      Table over distances
+        pop_size (int):           Population size, should be an even number
+        p_mutation (float):       Chance of mutation
+        num_gens (int):           Number of generations before termination
+        crossover:                Function creating a generation of offspring from
+                                  the selected parents, or its name in CROSSOVERS
+        islands (int):            Number of subpopulations. cache, unique, stop,
+                                  checkpoint, resume and warm_start raise a
+                                  ValueError with more than one
+        migration_interval (int): Generations between each migration
+        migrants (int):           Individuals each island sends per migration
+        topology (str):           "ring" or "full", which islands migrants go to
+        monitor:                  GenerationMonitor that receives the stats of
+                                  every generation, not used with islands
+        mutation:                 Batch mutation operator, or its name in MUTATIONS
+        cache (FitnessCache):     Cache of distances of tours seen before, see
+                                  FitnessCache.stats
+        unique (bool):            Remove duplicate tours in survivor selection
+        seeding (dict):           Construction heuristics for the first
+                                  population, see initiate_population
+        stop (StoppingCriteria):  Criteria for stopping before num_gens
+                                  generations
+        checkpoint (str):         File the state of the run is saved to every
+                                  checkpoint_interval generations and at the
+                                  end, see checkpoint.save_checkpoint
+        checkpoint_interval (int): Generations between each checkpoint
+        resume (bool):            Continue from checkpoint if the file exists
+        warm_start (str):         Checkpoint of an earlier run whose best
+                                  individuals replace the worst half of the
+                                  first population
+        selection:                Parent selection, or its name in SELECTIONS
+        rng (np.random.Generator): Random number generator, or a seed. Runs
+                                  with the same seed give the same result
+
+    Returns:
+        A tuple containing the best individual of the last generation, the
+        shortest distance of each generation and why the run stopped,
+        GENERATIONS or the reason given by stop
     """
     if pop_size % 2 == 1:
         print("Population size must be even numbered")
         return
 
-    best_of_each_gen = []
-    population = initiate_population(pop_size, cities, distances)
+    if isinstance(crossover, str):
+        crossover = CROSSOVERS[crossover]
+    if isinstance(mutation, str):
+        mutation = MUTATIONS[mutation]
+    if isinstance(selection, str):
+        selection = SELECTIONS[selection]
+    rng = np.random.default_rng(rng)
+
+    if islands > 1:
+        # The islands run whole generations in lockstep in their own processes
+        unsupported = [name for name, value in (("cache", cache), ("unique", unique), ("stop", stop),
+                                                ("checkpoint", checkpoint), ("resume", resume),
+                                                ("warm_start", warm_start)) if value]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} can't be used with islands")
+        from island_model import island_model
+        best, best_of_each_gen = island_model(len(cities), distances, pop_size, p_mutation, num_gens, crossover,
+                                              islands, migration_interval, migrants, topology, mutation,
+                                              seeding, selection, rng)
+        return [cities[i] for i in best[0]], best[1], best_of_each_gen, GENERATIONS
 
-    for gen_n in range(num_gens-1):
+    best_of_each_gen = []
+    reason = GENERATIONS
+    if stop is not None:
+        stop.start()
+    start_gen = 0
+    if resume and checkpoint is not None and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        population, start_gen, best_of_each_gen = state["population"], state["generation"], state["best_of_each_gen"]
+        if state["rng_state"] is not None:
+            rng.bit_generator.state = state["rng_state"]
+    else:
+        population = initiate_population(pop_size, cities, distances, seeding, rng)
+        if warm_start is not None:
+            population = warm_start_population(population, warm_start)
+    if checkpoint is not None:
+        # Operators that aren't in the dicts are stored as None, resume can't restore them
+        settings = {"pop_size": pop_size, "p_mutation": p_mutation, "num_gens": num_gens, "unique": unique,
+                    "crossover": next((name for name, f in CROSSOVERS.items() if f is crossover), None),
+                    "mutation": next((name for name, f in MUTATIONS.items() if f is mutation), None),
+                    "selection": next((name for name, f in SELECTIONS.items() if f is selection), None)}
+
+    for gen_n in range(start_gen, num_gens-1):
+        if checkpoint is not None and gen_n > start_gen and gen_n % checkpoint_interval == 0:
+            save_checkpoint(checkpoint, population, gen_n, best_of_each_gen, settings, rng)
+        if stop is not None and stop.check(population, pop_size):
+            reason = stop.reason
+            break
         best_of_each_gen.append(get_best(population)[1])
-        # print(f"Gen {gen_n} average: {average_dist(population)}")
-        # print(get_best(population)[1])
-
-        # parents = tournament_selection(population, pop_size)
-        parents = ranked_selection(population, pop_size)
-        offspring = []
-        for i in range(0, pop_size, 2):
-            offspring.extend(pmx_pair(parents[i][0], parents[i+1][0]))
-
-        for child in offspring:
-            if random.random() < p_mutation:
-                insert_mutation(child)
-            population.append((child, measure_distance(child, distances)))
 
-        population = survivor_selection(population, pop_size)
+        population = next_generation(population, distances, pop_size, p_mutation, crossover, monitor, mutation,
+                                     cache, unique, selection, rng)
+        if monitor is not None:
+            monitor.end_generation(gen_n + 1, population)
 
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, population, len(best_of_each_gen), best_of_each_gen, settings, rng)
     best = get_best(population)
     best_of_each_gen.append(best[1])
 
-    return [cities[i] for i in best[0]], best[1], best_of_each_gen
-
-
-def measure_genetic(number_of_runs, pop_size, num_gens, p_mutation, cities, distances):
-    """
-    Method that runs the genetic algorithm several times and measures how well it
-    does. It calculates the average and standard deviation of all the runs as well
-    as it plots the average of each generation
-    Args:
-        number_of_runs (int)
-        pop_size (int): Population size
-        num_gens (int): Number of generations
-        p_mutation (float): Chance of mutation
-        cities: List of all cities to visit
-        distances (2d-list): table over distances
-    """
-    results = []
-    total_dist = 0
-    total_time = 0
-    generations = []  # Each index is the best of each generation for one of the runs
-
-    for _ in range(number_of_runs):
-        start = time.time()
-        result = genetic_algorithm(cities, distances, pop_size, p_mutation, num_gens)
-        stop = time.time()
-        total_dist += result[1]
-        results.append(result[:2])
-        generations.append(result[2])
-        total_time += (stop - start)
-
-    print(f"\nResults of genetic algorithm over {number_of_runs} runs")
-    print(f"Population:            {pop_size}")
-    print(f"Number of generations: {num_gens}")
-    print(f"Chance of mutations:   {p_mutation*100}%")
-    print(f"Average time:          {total_time/number_of_runs} s")
-    print_info(results, total_dist, number_of_runs)
-
-    average_of_generations = [0]*num_gens
-    for i in range(number_of_runs):
-        for j in range(num_gens):
-            average_of_generations[j] += generations[i][j]/number_of_runs
-    plt.plot(average_of_generations, label=f"Population size: {pop_size}")
+    return [cities[i] for i in best[0]], best[1], best_of_each_gen, reason
 
 
 def genetic_main():
     """
     Main-method for genetic algorithm and calculations
     """
+    import matplotlib.pyplot as plt
+    from reporting import measure_genetic
+
     cities, distances = read_file("european_cities.csv")
     # genetic_algorithm(cities, distances, 200, 0.5, 100)
     measure_genetic(20, 50, 150, 0.5, cities, distances)
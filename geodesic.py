@@ -0,0 +1,155 @@
+import numpy as np
+from instances import haversine, from_coordinates
+
+EARTH_RADIUS = 6371.0
+
+
+def unit_vectors(coordinates):
+    """
+    Places coordinates on the unit sphere. The straight line between two
+    points grows with the great-circle distance, so a KD-tree over these
+    points finds the geographically closest ones.
+    Args:
+        coordinates (2d-array): latitude and longitude in decimal degrees per row
+
+    Returns:
+        (2d-array): x, y and z of each point
+    """
+    latitude, longitude = np.radians(np.asarray(coordinates, dtype=float)).T
+    return np.column_stack((np.cos(latitude) * np.cos(longitude),
+                            np.cos(latitude) * np.sin(longitude), np.sin(latitude)))
+
+
+def kd_tree(points):
+    """
+    KD-tree over points. scipy is imported here on first use instead of at
+    import, since it takes longer to import than all the solvers together.
+    Args:
+        points (2d-array): one point per row
+
+    Returns:
+        scipy.spatial.cKDTree, or None when scipy is not installed
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:  # scipy is optional, callers then go through all points
+        return None
+    return cKDTree(points)
+
+
+def _chord(kilometers):
+    return 2 * np.sin(np.minimum(kilometers / EARTH_RADIUS, np.pi) / 2)
+
+
+def _arc(chord):
+    return 2 * EARTH_RADIUS * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def haversine_matrix(a, b=None, chunk_size=1024, dtype=np.float64):
+    """
+    Great-circle distances between two sets of points, computed a block of
+    rows at a time so that only one block of temporaries is in memory
+    Args:
+        a (2d-array): latitude and longitude in decimal degrees per row
+        b (2d-array): second set of points, defaults to a
+        chunk_size (int): rows computed at once
+        dtype: type of the result, np.float32 halves its memory
+
+    Returns:
+        (2d-array): distance in kilometers from every point of a to every point of b
+    """
+    a = np.asarray(a, dtype=float)
+    b = a if b is None else np.asarray(b, dtype=float)
+    matrix = np.empty((len(a), len(b)), dtype=dtype)
+    for start in range(0, len(a), chunk_size):
+        matrix[start:start + chunk_size] = haversine(a[start:start + chunk_size, np.newaxis], b[np.newaxis])
+    return matrix
+
+
+class GeoIndex:
+    """
+    Spatial index over points given as latitude and longitude, for k nearest
+    neighbor and radius queries by great-circle distance. Uses a KD-tree on
+    the unit sphere when scipy is installed, and goes through the points in
+    blocks otherwise.
+    Args:
+        coordinates (2d-array): latitude and longitude in decimal degrees per row
+    """
+
+    def __init__(self, coordinates):
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        self.tree = kd_tree(unit_vectors(self.coordinates))
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def nearest(self, points, k=1):
+        """
+        Finds the k closest indexed points of each point
+        Args:
+            points (2d-array): latitude and longitude in decimal degrees per row
+            k (int)
+
+        Returns:
+            Tuple containing the distances in kilometers and the indices,
+            both of shape (len(points), k), closest first
+        """
+        points = np.atleast_2d(points)
+        k = min(k, len(self))
+        if self.tree is not None:
+            chords, indices = self.tree.query(unit_vectors(points), k)
+            chords, indices = chords.reshape(len(points), k), indices.reshape(len(points), k)
+            return _arc(chords), indices
+        block = haversine_matrix(points, self.coordinates)
+        rows = np.arange(len(points))[:, np.newaxis]
+        indices = np.argpartition(block, k - 1, axis=1)[:, :k]
+        indices = indices[rows, np.argsort(block[rows, indices], axis=1)]
+        return block[rows, indices], indices
+
+    def within(self, points, radius):
+        """
+        Finds the indexed points within a distance of each point
+        Args:
+            points (2d-array): latitude and longitude in decimal degrees per row
+            radius (float): kilometers
+
+        Returns:
+            List with an array of indices for each point
+        """
+        points = np.atleast_2d(points)
+        if self.tree is not None:
+            found = self.tree.query_ball_point(unit_vectors(points), _chord(radius) * (1 + 1e-12))
+            return [np.sort(np.asarray(indices, dtype=int)) for indices in found]
+        return [np.flatnonzero(row <= radius) for row in haversine_matrix(points, self.coordinates)]
+
+
+def plotting_coordinates():
+    """
+    Coordinates of the 24 cities of european_cities.csv, from plotting_utils
+
+    Returns:
+        Tuple containing names of cities and their latitude and longitude
+    """
+    from plotting_utils.plotting_utils import city_coordinates_names
+
+    names = list(city_coordinates_names)
+    return names, np.array([city_coordinates_names[name] for name in names])
+
+
+def geographic_instance(coordinates=None, names=None, lazy=True, dtype=np.float64):
+    """
+    Creates an instance with great-circle distances between coordinates,
+    without a precomputed distance table
+    Args:
+        coordinates (2d-array): latitude and longitude in decimal degrees per
+                                row, defaults to the cities of plotting_utils
+        names: names of the cities, defaults to their numbers
+        lazy (bool): if True, distances are computed on demand
+        dtype: type of the distances, np.float32 for the compact form
+
+    Returns:
+        Tuple containing names of cities and the distances
+    """
+    if coordinates is None:
+        names, coordinates = plotting_coordinates()
+    return from_coordinates(coordinates, haversine, names, lazy, dtype)
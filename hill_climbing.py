@@ -1,8 +1,8 @@
 import numpy as np
-from plotting_utils.plotting_utils import plot_tour
 from general_tools import *
+from local_search import local_search
 
-from general_tools import *
+__all__ = ["get_neighbors", "hill_climbing"]
 
 
 def get_neighbors(permutation, distances):
@@ -15,59 +15,41 @@ def get_neighbors(permutation, distances):
         permutation (np.array)
 
     Returns:
-        list of all neighbors
+        Population of all neighbors
     """
-    neighbors = []
-    for i in range(len(permutation)):
-        for j in range(i+1, len(permutation)):
-            neigh = permutation.copy()
-            neigh[i], neigh[j] = neigh[j], neigh[i]
-            neighbors.append((neigh, measure_distance(neigh, distances)))
-    return neighbors
+    permutation = np.asarray(permutation)
+    i, j = np.triu_indices(len(permutation), 1)
+    rows = np.arange(len(i))
+    neighbors = np.tile(permutation, (len(i), 1))
+    neighbors[rows, i] = permutation[j]
+    neighbors[rows, j] = permutation[i]
+    return Population(neighbors, measure_distances(neighbors, distances))
 
 
-def hill_climbing(cities, distances):
+def hill_climbing(cities, distances, neighborhood="swap", strategy="best", rng=None, time_limit=None):
     """
     An implementation of the steepest ascend hill climbing algorithm to find a
-    solution to TSP-problem.
+    solution to TSP-problem. Moves are scored by their change in distance
+    instead of measuring every neighbor, see local_search.
     Args:
         cities: List of all cities to visit
         distances (2d-list): table over distances
+        neighborhood (str): "swap" or "2opt"
+        strategy (str): "best" for steepest ascend, "first" for first-improvement
+        rng (np.random.Generator): random number generator, or a seed
+        time_limit (float): stop after this many seconds
 
     Returns:
         A tuple containing the shortest tour found and its distance
     """
-    best = np.random.permutation(len(cities))
-    best_dist = measure_distance(best, distances)
-    neighbor, n_dist = get_best(get_neighbors(best, distances))
-    while n_dist < best_dist:
-        best = neighbor
-        best_dist = n_dist
-        neighbor, n_dist = get_best(get_neighbors(best, distances))
+    best = np.random.default_rng(rng).permutation(len(cities))
+    best, best_dist = local_search(best, distances, neighborhood, strategy, time_limit=time_limit)
     return [cities[i] for i in best], best_dist
 
 
-def measure_hill_climbing(number_of_runs, cities, distances):
-    """
-    Runs the hill climbing algorithm n times to measure how well it does
-    Args:
-        number_of_runs (int)
-        cities: List of all cities to visit
-        distances (2d-list): table over distances
-    """
-    results = []
-    total_dist = 0
-
-    for _ in range(number_of_runs):
-        result = hill_climbing(cities, distances)
-        total_dist += result[1]
-        results.append(result)
-
-    print(f"\nResults of hill climbing on {len(cities)} cities {number_of_runs} times")
-    print_info(results, total_dist, number_of_runs)
-
-
 def main():
+    from plotting_utils.plotting_utils import plot_tour
+
     cities, distances = read_file("european_cities.csv")
     best = hill_climbing(cities, distances)
     plot_tour(best[0], show_map=True)
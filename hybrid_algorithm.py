@@ -1,67 +1,148 @@
-from genetic_algorithm import *
-from hill_climbing import *
+import numpy as np
 from general_tools import *
+from genetic_algorithm import SELECTIONS, initiate_population, next_generation, ranked_selection
+from crossover import CROSSOVERS, pmx_offspring
+from mutation import MUTATIONS, insert_mutation_batch
+from local_search import local_search
+from candidates import candidate_lists
+from instrumentation import no_phase
+from stopping import GENERATIONS
 
+__all__ = ["hill_climbing", "improved_individuals", "hybrid_algorithm"]
 
-def hill_climbing(distances, start):
+
+def hill_climbing(distances, start, neighborhood="2opt", strategy="first", neighbors=None, max_moves=None,
+                  time_limit=None):
     """
     Function to perform hill climbing from a start permutation
     Args:
         distances: 2D array containing the distances
         start: Start permutation to start hill climbing from
+        neighborhood (str): "swap", "2opt", "oropt" or "or2opt"
+        strategy (str): "first" or "best" improvement
+        neighbors (2d-array): candidate lists from candidates.candidate_lists
+        max_moves (int): stop after this many moves
+        time_limit (float): stop after this many seconds
 
     Returns:
         Tuple containing the local best starting from start
     """
     best, best_dist = start
-    neighbor, n_dist = get_best(get_neighbors(best, distances))
-
-    while n_dist < best_dist:
-        best = neighbor
-        best_dist = n_dist
-        neighbor, n_dist = get_best(get_neighbors(best, distances))
+    return local_search(best, distances, neighborhood, strategy, neighbors, max_moves, time_limit)
 
-    return best, best_dist
 
+def improved_individuals(population, improve="all", improve_rate=0.2, rng=None):
+    """
+    Function that chooses which individuals the local search improves
+    Args:
+        population (Population)
+        improve (str): "all", "top" for the improve_rate fraction with the
+                       shortest tours, or "random" for each individual with
+                       probability improve_rate
+        improve_rate (float)
+        rng (np.random.Generator): random number generator, or a seed
 
-def hybrid_algorithm(cities, distances, pop_size, p_mutation, num_gens):
+    Returns:
+        (np.array): indices of the individuals to improve
+    """
+    if improve == "all":
+        return np.arange(len(population))
+    if improve == "top":
+        count = int(np.ceil(improve_rate * len(population)))
+        return np.argsort(population.fitness)[:count]
+    if improve == "random":
+        return np.flatnonzero(np.random.default_rng(rng).random(len(population)) < improve_rate)
+    raise ValueError(f"Unknown improve: {improve}")
+
+
+def hybrid_algorithm(cities, distances, pop_size, p_mutation, num_gens,
+                     neighborhood="2opt", strategy="first", crossover=pmx_offspring, candidates=None,
+                     monitor=None, mutation=insert_mutation_batch, cache=None, unique=False,
+                     improve="all", improve_rate=0.2, max_moves=None, time_limit=None, seeding=None,
+                     stop=None, selection=ranked_selection, rng=None):
     """
     Algorithm that combines a genetic algorithm with a hill climbing to
-    perform a local search for each generation.
+    perform a local search for each generation. With a cache, tours that
+    were climbed before, like survivors that already are local optima, get
+    the remembered result instead of being climbed again.
     Args:
         cities:              List of all cities to visit
         distances (2d-list): Table over distances
         pop_size (int):      Population size, should be an even number
         p_mutation (float):  Chance of mutation
         num_gens (int):      Number of generations before termination
+        neighborhood (str):  Local search moves, "swap", "2opt", "oropt" or
+                             "or2opt" for both 2-opt and Or-opt
+        strategy (str):      "first" or "best" improvement local search
+        crossover:           Function creating a generation of offspring from
+                             the selected parents, or its name in CROSSOVERS
+        candidates (2d-array): Candidate lists for the local search, built
+                             from distances if not given
+        monitor:             GenerationMonitor that receives the stats of
+                             every generation
+        mutation:            Batch mutation operator, or its name in MUTATIONS
+        cache (FitnessCache): Cache of distances and local optima
+        unique (bool):       Remove duplicate tours in survivor selection
+        improve (str):       Individuals to improve each generation, "all",
+                             "top" or "random", see improved_individuals
+        improve_rate (float): Fraction or chance used by improve
+        max_moves (int):     Local search moves allowed per individual
+        time_limit (float):  Seconds of local search allowed per individual
+        seeding (dict):      Construction heuristics for the first
+                             population, see initiate_population
+        stop (StoppingCriteria): Criteria for stopping before num_gens
+                             generations. Local search is cut short when
+                             its time limit runs out.
+        selection:           Parent selection, or its name in SELECTIONS
+        rng (np.random.Generator): Random number generator, or a seed
 
     Returns:
-        A tuple containing the best individual of the last generation and the
-        shortest distance of each generation
+        A tuple containing the best individual of the last generation, its
+        distance and why the run stopped, GENERATIONS or the reason given by stop
     """
-    population = initiate_population(pop_size, cities, distances)
+    if isinstance(crossover, str):
+        crossover = CROSSOVERS[crossover]
+    if isinstance(mutation, str):
+        mutation = MUTATIONS[mutation]
+    if isinstance(selection, str):
+        selection = SELECTIONS[selection]
+    rng = np.random.default_rng(rng)
+
+    reason = GENERATIONS
+    if stop is not None:
+        stop.start()
+    population = initiate_population(pop_size, cities, distances, seeding, rng)
+    if candidates is None:
+        candidates = candidate_lists(distances)
 
     for gen_n in range(num_gens):
+        if stop is not None and stop.check(population, pop_size):
+            reason = stop.reason
+            break
         # Local search:
-        for i in range(pop_size):
-            population[i] = hill_climbing(distances, population[i])
-        # print(f"Gen {gen_n} average: {average_dist(population)}")
-        # print(get_best(population))
-
-        # parents = tournament_selection(population, pop_size)
-        parents = ranked_selection(population, pop_size)
-        offspring = []
-        for i in range(0, pop_size, 2):
-            offspring.extend(pmx_pair(parents[i][0], parents[i + 1][0]))
-
-        for child in offspring:
-            if random.random() < p_mutation:
-                insert_mutation(child)
-            population.append((child, measure_distance(child, distances)))
-
-        population = survivor_selection(population, pop_size)
-
-    return get_best(population)
+        with no_phase("local_search") if monitor is None else monitor.phase("local_search"):
+            for i in improved_individuals(population, improve, improve_rate, rng):
+                budget = time_limit
+                if stop is not None and stop.deadline is not None:
+                    if stop.expired():
+                        break
+                    budget = stop.remaining() if time_limit is None else min(time_limit, stop.remaining())
+                start = (population.tours[i], population.fitness[i])
+                result = None if cache is None else cache.local_optimum(start[0])
+                if result is None:
+                    result = hill_climbing(distances, start, neighborhood, strategy, candidates, max_moves,
+                                           budget)
+                    # A search cut short by its budget may not have reached a local optimum
+                    if cache is not None and budget is None and max_moves is None:
+                        cache.store_optimum(start[0], result)
+                population.tours[i], population.fitness[i] = result
+
+        population = next_generation(population, distances, pop_size, p_mutation, crossover, monitor, mutation,
+                                     cache, unique, selection, rng)
+        if monitor is not None:
+            monitor.end_generation(gen_n + 1, population)
+
+    return (*get_best(population), reason)
 
 
 def main():
@@ -0,0 +1,337 @@
+import os
+import numpy as np
+from general_tools import read_file
+
+TSPLIB_SECTIONS = ("NODE_COORD_SECTION", "EDGE_WEIGHT_SECTION", "DISPLAY_DATA_SECTION",
+                   "DEPOT_SECTION", "TOUR_SECTION", "FIXED_EDGES_SECTION", "EOF")
+
+
+def euclidean(a, b):
+    """
+    Euclidean distance
+    Args:
+        a (np.array): coordinates, x and y in the last axis
+        b (np.array): coordinates, x and y in the last axis
+
+    Returns:
+        (np.array): distances between a and b
+    """
+    return np.hypot(a[..., 0] - b[..., 0], a[..., 1] - b[..., 1])
+
+
+def euc_2d(a, b):
+    """
+    TSPLIB EUC_2D distance, euclidean distance rounded to the nearest integer
+    Args:
+        a (np.array): coordinates, x and y in the last axis
+        b (np.array): coordinates, x and y in the last axis
+
+    Returns:
+        (np.array): distances between a and b
+    """
+    return np.rint(euclidean(a, b))
+
+
+def att(a, b):
+    """
+    TSPLIB ATT (pseudo-euclidean) distance
+    Args:
+        a (np.array): coordinates, x and y in the last axis
+        b (np.array): coordinates, x and y in the last axis
+
+    Returns:
+        (np.array): distances between a and b
+    """
+    r = np.sqrt(((a[..., 0] - b[..., 0]) ** 2 + (a[..., 1] - b[..., 1]) ** 2) / 10)
+    t = np.rint(r)
+    return np.where(t < r, t + 1, t)
+
+
+def geo(a, b):
+    """
+    TSPLIB GEO distance between coordinates given as degrees.minutes
+    Args:
+        a (np.array): coordinates, latitude and longitude in the last axis
+        b (np.array): coordinates, latitude and longitude in the last axis
+
+    Returns:
+        (np.array): distances between a and b in kilometers
+    """
+    def radians(x):
+        degrees = np.trunc(x)
+        return 3.141592 * (degrees + 5 * (x - degrees) / 3) / 180
+
+    a, b = radians(np.asarray(a, dtype=float)), radians(np.asarray(b, dtype=float))
+    q1 = np.cos(a[..., 1] - b[..., 1])
+    q2 = np.cos(a[..., 0] - b[..., 0])
+    q3 = np.cos(a[..., 0] + b[..., 0])
+    d = np.trunc(6378.388 * np.arccos(np.clip(0.5 * ((1 + q1) * q2 - (1 - q1) * q3), -1, 1)) + 1)
+    return np.where(np.all(a == b, axis=-1), 0, d)
+
+
+def haversine(a, b):
+    """
+    Great-circle distance on a sphere with the mean radius of the earth
+    Args:
+        a (np.array): coordinates, latitude and longitude in decimal degrees in the last axis
+        b (np.array): coordinates, latitude and longitude in decimal degrees in the last axis
+
+    Returns:
+        (np.array): distances between a and b in kilometers
+    """
+    a, b = np.radians(a), np.radians(b)
+    h = np.sin((b[..., 0] - a[..., 0]) / 2) ** 2 + \
+        np.cos(a[..., 0]) * np.cos(b[..., 0]) * np.sin((b[..., 1] - a[..., 1]) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+METRICS = {"EUCLIDEAN": euclidean, "EUC_2D": euc_2d, "ATT": att, "GEO": geo, "HAVERSINE": haversine}
+
+BACKENDS = ("dense", "memmap", "coordinates")
+
+
+class CoordinateDistances:
+    """
+    Distance table computed from coordinates on demand instead of being stored.
+    Supports the same indexing as a 2d numpy array, distances[i, j] with
+    integers or index arrays and distances[i] for whole rows, and turns into
+    a dense matrix with np.asarray.
+    Args:
+        coordinates (2d-array): one row of coordinates per city
+        metric: function computing distances between arrays of coordinates,
+                or its name in METRICS
+        dtype: type of the distances returned, np.float32 halves the memory
+               of the rows and blocks handed out
+    """
+
+    # Every metric in METRICS gives the same distance both ways, see general_tools.is_symmetric
+    symmetric = True
+
+    def __init__(self, coordinates, metric=euclidean, dtype=np.float64):
+        self.coordinates = np.asarray(coordinates, dtype=float)
+        self.metric = METRICS[metric] if isinstance(metric, str) else metric
+        self.shape = (len(self.coordinates), len(self.coordinates))
+        self.dtype = np.dtype(dtype)
+        self.ndim = 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+        if isinstance(rows, (int, np.integer)) and isinstance(cols, (int, np.integer)):
+            return self.dtype.type(self.metric(self.coordinates[rows], self.coordinates[cols]))
+        if isinstance(cols, slice):
+            rows = np.asarray(np.arange(self.shape[0])[rows] if isinstance(rows, slice) else rows)
+            cols = np.arange(self.shape[1])[cols]
+            if rows.ndim == 1:
+                rows = rows[:, np.newaxis]
+        rows, cols = np.broadcast_arrays(np.asarray(rows), np.asarray(cols))
+        return self.metric(self.coordinates[rows], self.coordinates[cols]).astype(self.dtype, copy=False)
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = np.empty(self.shape, dtype=dtype or self.dtype)
+        self.fill(matrix)
+        return matrix
+
+    def fill(self, matrix, chunk_size=1024):
+        """
+        Writes the full distance table into matrix a block of rows at a time,
+        so only one block of temporaries is held in memory
+        Args:
+            matrix (2d-array): array or memory map of shape self.shape
+            chunk_size (int): rows per block
+        """
+        for start in range(0, self.shape[0], chunk_size):
+            matrix[start:start + chunk_size] = self[start:start + chunk_size]
+
+
+def to_backend(distances, backend="dense", dtype=None, filename=None):
+    """
+    Converts distances to another storage. Every algorithm accepts all of them.
+    "dense" is an in-memory matrix, "memmap" a matrix in a .npy file that is
+    memory mapped and paged in by the operating system, and "coordinates"
+    computes distances from the coordinates when they are needed, see
+    CoordinateDistances. A dtype of np.float32 halves the memory of any of them.
+    Args:
+        distances (2d-array): table over distances, a CoordinateDistances for
+                              the "coordinates" backend
+        backend (str): one of BACKENDS
+        dtype: type of the distances, defaults to the current one
+        filename (str): .npy file for the "memmap" backend
+
+    Returns:
+        The distances in the new storage
+    """
+    dtype = np.dtype(dtype or distances.dtype)
+    if backend == "dense":
+        return np.asarray(distances, dtype=dtype)
+    if backend == "memmap":
+        if filename is None:
+            raise ValueError("The memmap backend needs a filename")
+        matrix = np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=distances.shape)
+        if isinstance(distances, CoordinateDistances):
+            distances.fill(matrix)
+        else:
+            for start in range(0, len(distances), 1024):
+                matrix[start:start + 1024] = distances[start:start + 1024]
+        matrix.flush()
+        del matrix
+        return np.load(filename, mmap_mode="r")
+    if backend == "coordinates":
+        if not isinstance(distances, CoordinateDistances):
+            raise ValueError("The coordinates backend needs distances computed from coordinates")
+        return CoordinateDistances(distances.coordinates, distances.metric, dtype)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def _explicit_matrix(weights, n, edge_weight_format):
+    """
+    Builds a full distance matrix from the numbers of an EDGE_WEIGHT_SECTION
+    """
+    matrix = np.zeros((n, n))
+    if edge_weight_format == "FULL_MATRIX":
+        return weights[:n * n].reshape(n, n)
+    lower = edge_weight_format.startswith("LOWER")
+    diagonal = "DIAG" in edge_weight_format
+    if edge_weight_format.endswith("_COL"):  # column-wise lower equals row-wise upper and vice versa
+        lower = not lower
+    rows, cols = np.tril_indices(n, 0 if diagonal else -1) if lower else np.triu_indices(n, 0 if diagonal else 1)
+    matrix[rows, cols] = weights[:len(rows)]
+    matrix[cols, rows] = weights[:len(rows)]
+    return matrix
+
+
+def read_tsplib(tsp_file, lazy=False):
+    """
+    Reads an instance in the TSPLIB .tsp format. Supports the EUC_2D, ATT and
+    GEO edge weight types as well as EXPLICIT distances in all matrix formats.
+    Args:
+        tsp_file (str): filename
+        lazy (bool): if True, distances of coordinate instances are computed
+                     on demand, see CoordinateDistances
+
+    Returns:
+        Tuple containing names of cities and the distances
+    """
+    header = {}
+    sections = {}
+    with open(tsp_file) as f:
+        current = None
+        for line in f:
+            line = line.strip()
+            keyword = line.split(":")[0].strip().upper()
+            if not line:
+                continue
+            if keyword in TSPLIB_SECTIONS:
+                current = sections.setdefault(keyword, [])
+            elif current is not None and line[0] in "0123456789+-.":
+                current.append(line)
+            elif ":" in line:
+                header[keyword] = line.split(":", 1)[1].strip()
+                current = None
+
+    n = int(header["DIMENSION"])
+    edge_weight_type = header.get("EDGE_WEIGHT_TYPE", "EXPLICIT").upper()
+    cities = np.arange(1, n + 1).astype(str)
+
+    if edge_weight_type == "EXPLICIT":
+        weights = np.array(" ".join(sections["EDGE_WEIGHT_SECTION"]).split(), dtype=float)
+        return cities, _explicit_matrix(weights, n, header.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX").upper())
+    if edge_weight_type not in METRICS:
+        raise ValueError(f"Unsupported EDGE_WEIGHT_TYPE: {edge_weight_type}")
+
+    nodes = np.array(" ".join(sections["NODE_COORD_SECTION"]).split(), dtype=float).reshape(n, -1)
+    coordinates = nodes[np.argsort(nodes[:, 0]), 1:3]
+    distances = CoordinateDistances(coordinates, edge_weight_type)
+    return cities, distances if lazy else np.asarray(distances)
+
+
+def from_coordinates(coordinates, metric=euclidean, names=None, lazy=True, dtype=np.float64):
+    """
+    Creates an instance from raw coordinates
+    Args:
+        coordinates (2d-array): one row of coordinates per city
+        metric: function computing distances between arrays of coordinates,
+                or its name in METRICS
+        names: names of the cities, defaults to their numbers
+        lazy (bool): if True, distances are computed on demand
+        dtype: type of the distances, np.float32 for the compact form
+
+    Returns:
+        Tuple containing names of cities and the distances
+    """
+    distances = CoordinateDistances(coordinates, metric, dtype)
+    if names is None:
+        names = np.arange(len(distances)).astype(str)
+    return names, distances if lazy else np.asarray(distances)
+
+
+def cache_file(instance_file):
+    """
+    Args:
+        instance_file (str): filename of an instance
+
+    Returns:
+        (str): filename of the binary distance matrix cached for it
+    """
+    return instance_file + ".dist.npy"
+
+
+def load_instance(instance_file, cache=True, lazy=False):
+    """
+    Loads an instance, either a semicolon-separated csv file like
+    european_cities.csv or a TSPLIB .tsp file. The distance matrix is saved
+    to a binary .npy file next to the instance the first time, and memory
+    mapped from it on later loads instead of being parsed again.
+    Args:
+        instance_file (str): filename
+        cache (bool): if True, read and write the cached distance matrix
+        lazy (bool): if True, coordinate instances are not turned into a
+                     distance matrix at all, see CoordinateDistances
+
+    Returns:
+        Tuple containing names of cities and the distances
+    """
+    tsplib = instance_file.endswith(".tsp")
+    cached = cache_file(instance_file)
+    if cache and not lazy and os.path.exists(cached) and os.path.getmtime(cached) >= os.path.getmtime(instance_file):
+        cities = read_tsplib_header(instance_file) if tsplib else read_csv_header(instance_file)
+        return cities, np.load(cached, mmap_mode="r")
+
+    cities, distances = read_tsplib(instance_file, lazy) if tsplib else read_file(instance_file)
+    if cache and isinstance(distances, np.ndarray):
+        np.save(cached, distances)
+        distances = np.load(cached, mmap_mode="r")
+    return cities, distances
+
+
+def read_csv_header(csv_file):
+    """
+    Reads only the city names of a csv instance, without its distances
+    Args:
+        csv_file (str): filename
+
+    Returns:
+        Array of the names of the cities
+    """
+    with open(csv_file) as f:
+        return np.array(f.readline().rstrip("\n").split(";"))
+
+
+def read_tsplib_header(tsp_file):
+    """
+    Reads only the city names of a TSPLIB instance, without its data sections
+    Args:
+        tsp_file (str): filename
+
+    Returns:
+        Array of the names of the cities
+    """
+    with open(tsp_file) as f:
+        for line in f:
+            if line.split(":")[0].strip().upper() == "DIMENSION":
+                return np.arange(1, int(line.split(":", 1)[1]) + 1).astype(str)
+    raise ValueError(f"No DIMENSION in {tsp_file}")
@@ -0,0 +1,144 @@
+import cProfile
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+PHASES = ("selection", "crossover", "mutation", "evaluation", "survivor_selection")
+
+_NO_PHASE = nullcontext()
+
+
+def no_phase(name):
+    """
+    Stand-in for GenerationMonitor.phase when nothing is monitored
+    """
+    return _NO_PHASE
+
+
+def diversity(population):
+    """
+    Function that measures how different the tours of a population are, from
+    the number of distinct edges they use. 0 when every tour is the same and 1
+    when no two tours share an edge.
+    Args:
+        population (Population)
+
+    Returns:
+        (float): diversity between 0 and 1
+    """
+    tours = population.tours.astype(np.int64)
+    pop_size, n = tours.shape
+    if pop_size < 2 or n < 3:
+        return 0.0
+    succ = np.roll(tours, -1, axis=1)
+    edges = np.minimum(tours, succ) * n + np.maximum(tours, succ)
+    return (len(np.unique(edges)) - n) / (n * (pop_size - 1))
+
+
+class GenerationMonitor:
+    """
+    Collects metrics of every generation of genetic_algorithm and
+    hybrid_algorithm, and passes them to callbacks. The stats of a generation
+    is a dict with the generation number, the seconds spent in each phase,
+    and the best, average and diversity of the population after it. Phases
+    can also be profiled with cProfile, or their peak memory traced with
+    tracemalloc.
+    Args:
+        callbacks: functions called with the stats of each generation
+        profile (bool): profile each phase with cProfile, see profile_stats
+        trace_memory (bool): record the peak memory of each phase in the stats
+    """
+
+    def __init__(self, *callbacks, profile=False, trace_memory=False):
+        self.callbacks = list(callbacks)
+        self.profiles = {} if profile else None
+        self.trace_memory = trace_memory
+        self.timings = {}
+        self.memory = {}
+        self.history = []
+        self._last = time.perf_counter()
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager that measures one phase of a generation
+        Args:
+            name (str): phase, e.g. one of PHASES
+        """
+        profiler = None
+        if self.profiles is not None:
+            profiler = self.profiles.setdefault(name, cProfile.Profile())
+            profiler.enable()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+            if self.trace_memory:
+                self.memory[name] = max(self.memory.get(name, 0), tracemalloc.get_traced_memory()[1] - before)
+            if profiler is not None:
+                profiler.disable()
+
+    def end_generation(self, generation, population):
+        """
+        Finishes the stats of a generation and passes them to the callbacks
+        Args:
+            generation (int): generation number
+            population (Population): population after the generation
+
+        Returns:
+            (dict): the stats of the generation
+        """
+        now = time.perf_counter()
+        stats = {
+            "generation": generation,
+            "time": now - self._last,
+            "timings": self.timings,
+            "best": float(np.min(population.fitness)),
+            "average": float(np.mean(population.fitness)),
+            "diversity": diversity(population),
+        }
+        if self.trace_memory:
+            stats["memory"] = self.memory
+        self.history.append(stats)
+        for callback in self.callbacks:
+            callback(stats)
+        self.timings, self.memory, self._last = {}, {}, time.perf_counter()
+        return stats
+
+    def close(self):
+        """
+        Stops tracemalloc if this monitor started it, tracing slows down everything else
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def totals(self):
+        """
+        Returns:
+            (dict): seconds spent in each phase over all generations so far
+        """
+        totals = {}
+        for stats in self.history:
+            for name, seconds in stats["timings"].items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def profile_stats(self, name):
+        """
+        Args:
+            name (str): phase
+
+        Returns:
+            pstats.Stats of the phase, e.g. profile_stats("crossover").sort_stats("cumtime").print_stats(10)
+        """
+        return pstats.Stats(self.profiles[name])
@@ -0,0 +1,148 @@
+import numpy as np
+import multiprocessing
+import queue
+import traceback
+from genetic_algorithm import initiate_population, next_generation, survivor_selection, ranked_selection
+from mutation import insert_mutation_batch
+from general_tools import *
+from parallel import share_distances, attach_distances, release
+
+
+def migration_targets(island, islands, topology="ring"):
+    """
+    Function that finds which islands an island sends its migrants to
+    Args:
+        island (int): Index of the island
+        islands (int): Number of islands
+        topology (str): "ring" sends to the next island, "full" to all others
+
+    Returns:
+        List of island indices
+    """
+    if topology == "ring":
+        return [(island + 1) % islands]
+    if topology == "full":
+        return [i for i in range(islands) if i != island]
+    raise ValueError(f"Unknown topology: {topology}")
+
+
+def _island(island, shared, inboxes, results, rng, n_cities, pop_size, p_mutation, num_gens,
+            crossover, migration_interval, migrants, topology, mutation, seeding, selection):
+    """
+    Evolves one island and exchanges migrants with the others every
+    migration_interval generations. inboxes[target][source] is the queue of
+    the migrants from island source to island target. An error is put in results
+    in place of the result of the island.
+    """
+    try:
+        _evolve(island, shared, inboxes, results, rng, n_cities, pop_size, p_mutation, num_gens, crossover,
+                migration_interval, migrants, topology, mutation, seeding, selection)
+    except BaseException as error:
+        # Sent back to island_model, which raises it instead of waiting forever
+        results.put((island, error, traceback.format_exc()))
+
+
+def _evolve(island, shared, inboxes, results, rng, n_cities, pop_size, p_mutation, num_gens,
+            crossover, migration_interval, migrants, topology, mutation, seeding, selection):
+    block, distances = attach_distances(shared)
+    islands = len(inboxes)
+    targets = migration_targets(island, islands, topology)
+
+    best_of_each_gen = []
+    population = initiate_population(pop_size, range(n_cities), distances, seeding, rng)
+    for gen_n in range(num_gens - 1):
+        best_of_each_gen.append(get_best(population)[1])
+        population = next_generation(population, distances, pop_size, p_mutation, crossover, mutation=mutation,
+                                     selection=selection, rng=rng)
+
+        if (gen_n + 1) % migration_interval == 0:
+            emigrants = population.take(np.argsort(population.fitness)[:migrants])
+            for target in targets:
+                inboxes[target][island].put(emigrants)
+            # One queue per source, read in a fixed order, so a fast source that already sent its next migrants
+            # can't change the order or the generation of the ones merged here
+            for source in sorted(inboxes[island]):
+                population = population.extend(inboxes[island][source].get())
+            population = survivor_selection(population, pop_size)
+
+    best = get_best(population)
+    best_of_each_gen.append(best[1])
+    results.put((island, best, best_of_each_gen))
+    if block is not None:
+        block.close()
+
+
+def island_model(n_cities, distances, pop_size, p_mutation, num_gens, crossover,
+                 islands, migration_interval=10, migrants=1, topology="ring", mutation=insert_mutation_batch,
+                 seeding=None, selection=ranked_selection, rng=None):
+    """
+    Island model genetic algorithm. The population is split into islands
+    that are evolved by next_generation in their own processes. Every
+    migration_interval generations each island sends copies of its best
+    individuals to its targets, and keeps the best of its population and the
+    arriving migrants. The distances are shared with the islands, see
+    parallel.share_distances.
+    Args:
+        n_cities (int):           Number of cities to visit
+        distances (2d-list):      Table over distances
+        pop_size (int):           Total population size, split evenly over the islands
+        p_mutation (float):       Chance of mutation
+        num_gens (int):           Number of generations before termination
+        crossover:                Function creating a generation of offspring
+        islands (int):            Number of islands
+        migration_interval (int): Generations between each migration
+        migrants (int):           Individuals each island sends per migration
+        topology (str):           "ring" or "full"
+        mutation:                 Batch mutation operator
+        seeding (dict):           Construction heuristics for the first
+                                  population of each island
+        selection:                Parent selection
+        rng (np.random.Generator): Random number generator, or a seed. Each
+                                  island gets its own stream spawned from it
+
+    Returns:
+        A tuple containing the best individual found, as (tour, distance), and
+        the shortest distance over all islands of each generation
+    """
+    island_size = max(2, pop_size // islands // 2 * 2)
+    streams = np.random.default_rng(rng).spawn(islands)
+    blocks, shared = share_distances(distances)
+    inboxes = [{} for _ in range(islands)]
+    for source in range(islands):
+        for target in migration_targets(source, islands, topology):
+            inboxes[target][source] = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_island, args=(
+        island, shared, inboxes, results, streams[island], n_cities, island_size, p_mutation, num_gens,
+        crossover, migration_interval, migrants, topology, mutation, seeding, selection)) for island in range(islands)]
+    try:
+        for process in processes:
+            process.start()
+        finished = []
+        exited = set()
+        while len(finished) < len(processes):
+            try:
+                island, *result = results.get(timeout=1)
+            except queue.Empty:
+                # An island that had exited already at the previous check would have sent its result by now
+                received = {result[0] for result in finished}
+                for island, process in enumerate(processes):
+                    if island in exited and island not in received:
+                        raise RuntimeError(f"Island {island} exited with code {process.exitcode} without a result")
+                    if process.exitcode is not None:
+                        exited.add(island)
+                continue
+            if isinstance(result[0], BaseException):
+                raise result[0] from RuntimeError(f"Raised in island {island}:\n{result[1]}")
+            finished.append((island, *result))
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        release(blocks)
+
+    best = min((result[1] for result in finished), key=lambda tup: tup[1])
+    best_of_each_gen = np.min([result[2] for result in finished], axis=0).tolist()
+    return best, best_of_each_gen
@@ -0,0 +1,461 @@
+import time
+import numpy as np
+from collections import deque
+from general_tools import *
+from candidates import candidate_lists
+
+NEIGHBORHOODS = ("swap", "2opt", "oropt", "or2opt")
+
+
+def swap_delta(tour, distances, i, j):
+    """
+    Change in distance if the cities at index i and j of the tour are swapped.
+    Only looks at the (up to) four edges touching the two positions.
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        i (int): First index
+        j (int): Second index
+
+    Returns:
+        (float): New distance minus current distance
+    """
+    n = len(tour)
+    i, j = i % n, j % n
+    if i == j:
+        return 0.0
+
+    def city(p):
+        p %= n
+        return tour[j] if p == i else tour[i] if p == j else tour[p]
+
+    delta = 0.0
+    for e in {(i - 1) % n, i, (j - 1) % n, j}:
+        delta += distances[city(e), city(e + 1)] - distances[tour[e], tour[(e + 1) % n]]
+    return delta
+
+
+def swap_deltas(tour, distances, i, j):
+    """
+    Vectorized swap_delta for many pairs of indices at once
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        i (np.array): First indices
+        j (np.array): Second indices, i[k] != j[k]
+
+    Returns:
+        (np.array): Change in distance of each swap
+    """
+    n = len(tour)
+
+    def city(p):
+        p = p % n
+        return np.where(p == i, tour[j], np.where(p == j, tour[i], tour[p]))
+
+    delta = np.zeros(len(i))
+    seen = []
+    for e in ((i - 1) % n, i, (j - 1) % n, j):
+        gain = distances[city(e), city(e + 1)] - distances[tour[e], tour[(e + 1) % n]]
+        duplicate = np.zeros(len(i), dtype=bool)
+        for s in seen:
+            duplicate |= s == e
+        delta += np.where(duplicate, 0, gain)
+        seen.append(e)
+    return delta
+
+
+def reversal_sums(tour, distances):
+    """
+    Prefix sums of what reversing each edge of the tour costs, for the deltas
+    of moves that reverse part of the tour on an asymmetric table. Edge k
+    goes from tour[k] to tour[k+1], and the edges k in [s, s+length) cost
+    sums[s+length] - sums[s] to reverse, for any s < n and length <= n.
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+
+    Returns:
+        (np.array): 2n + 1 prefix sums over the edges of the tour, twice around
+    """
+    succ = np.roll(tour, -1)
+    cost = np.asarray(distances[succ, tour], dtype=np.float64) - distances[tour, succ]
+    return np.concatenate(([0.0], np.cumsum(np.concatenate((cost, cost)))))
+
+
+def two_opt_delta(tour, distances, i, j, reversal=None):
+    """
+    Change in distance of the 2-opt move that removes the edges after index i
+    and j and reconnects the tour by reversing tour[i+1:j+1].
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        i (int): First index
+        j (int): Second index
+        reversal (np.array): reversal_sums of the tour, needed when the table
+                             is asymmetric and the reversed edges change length
+
+    Returns:
+        (float): New distance minus current distance
+    """
+    n = len(tour)
+    i, j = min(i, j), max(i, j)
+    a, b = tour[i], tour[(i + 1) % n]
+    c, d = tour[j], tour[(j + 1) % n]
+    delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+    if reversal is not None:
+        delta += reversal[j] - reversal[i + 1]
+    return delta
+
+
+def two_opt_deltas(tour, distances, i, j, reversal=None):
+    """
+    Vectorized two_opt_delta for many pairs of indices at once
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        i (np.array): First indices
+        j (np.array): Second indices
+        reversal (np.array): reversal_sums of the tour, for asymmetric tables
+
+    Returns:
+        (np.array): Change in distance of each move
+    """
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    succ = np.roll(tour, -1)
+    a, b, c, d = tour[i], succ[i], tour[j], succ[j]
+    delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+    if reversal is not None:
+        delta = delta + reversal[j] - reversal[i + 1]
+    return delta
+
+
+def apply_two_opt(tour, position, i, j):
+    """
+    Performs a 2-opt move in place by reversing tour[i+1:j+1]
+    Args:
+        tour (np.array)
+        position (np.array): index of every city in the tour, kept up to date
+        i (int): First index
+        j (int): Second index
+    """
+    if i > j:
+        i, j = j, i
+    tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+    position[tour[i + 1:j + 1]] = np.arange(i + 1, j + 1)
+
+
+def apply_swap(tour, position, i, j):
+    """
+    Swaps the cities at index i and j in place
+    Args:
+        tour (np.array)
+        position (np.array): index of every city in the tour, kept up to date
+        i (int): First index
+        j (int): Second index
+    """
+    tour[i], tour[j] = tour[j], tour[i]
+    position[tour[i]], position[tour[j]] = i, j
+
+
+def or_opt_delta(tour, distances, i, length, j, reverse=False, reversal=None):
+    """
+    Change in distance of the Or-opt move that takes the segment of length
+    cities starting at index i out of the tour and puts it back in between
+    index j and j + 1, reversed or not. Index j must lie outside the segment
+    and not right before it. Also works on arrays of moves.
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        i (int): Index of the first city of the segment
+        length (int): Number of cities in the segment
+        j (int): Index of the city the segment is put after
+        reverse (bool): Insert the segment reversed
+        reversal (np.array): reversal_sums of the tour, needed when the table
+                             is asymmetric and the reversed edges change length
+
+    Returns:
+        (float): New distance minus current distance
+    """
+    n = len(tour)
+    p, first, last, nxt = tour[(i - 1) % n], tour[i % n], tour[(i + length - 1) % n], tour[(i + length) % n]
+    x, y = tour[j % n], tour[(j + 1) % n]
+    if np.ndim(reverse):
+        head, tail = np.where(reverse, last, first), np.where(reverse, first, last)
+    else:
+        head, tail = (last, first) if reverse else (first, last)
+    delta = distances[p, nxt] + distances[x, head] + distances[tail, y] \
+        - distances[p, first] - distances[last, nxt] - distances[x, y]
+    if reversal is not None:
+        # The length - 1 edges inside the segment, from index i on
+        inner = reversal[i % n + length - 1] - reversal[i % n]
+        delta = delta + (np.where(reverse, inner, 0.0) if np.ndim(reverse) else inner if reverse else 0.0)
+    return delta
+
+
+def apply_or_opt(tour, position, i, length, j, reverse=False):
+    """
+    Performs an Or-opt move in place, see or_opt_delta. The tour is rotated
+    as part of the move.
+    Args:
+        tour (np.array)
+        position (np.array): index of every city in the tour, kept up to date
+        i (int): Index of the first city of the segment
+        length (int): Number of cities in the segment
+        j (int): Index of the city the segment is put after
+        reverse (bool): Insert the segment reversed
+    """
+    rolled = np.roll(tour, -i)
+    segment, rest = rolled[:length], rolled[length:]
+    after = (j - i) % len(tour) - length + 1
+    tour[:] = np.concatenate((rest[:after], segment[::-1] if reverse else segment, rest[after:]))
+    position[tour] = np.arange(len(tour))
+
+
+def _or_opt_moves(tour, position, neighbors, max_length=3):
+    """
+    Or-opt moves as arrays (i, length, j, reverse). With candidate lists
+    only moves that put the first city of the segment next to one of its
+    neighbors are made, otherwise every insertion point is tried.
+    """
+    n = len(tour)
+    lengths = np.arange(1, min(max_length, n - 3) + 1)
+    if neighbors is None:
+        i, length, j = (a.ravel() for a in np.meshgrid(np.arange(n), lengths, np.arange(n), indexing="ij"))
+        i, length, j = np.tile(i, 2), np.tile(length, 2), np.tile(j, 2)
+        reverse = np.repeat([False, True], len(i) // 2)
+    else:
+        k = neighbors.shape[1]
+        i = np.repeat(np.arange(n), len(lengths) * k)
+        length = np.tile(np.repeat(lengths, k), n)
+        c = position[neighbors[tour[i], np.tile(np.arange(k), n * len(lengths))]]
+        # The neighbor comes right before the segment, or right after it when reversed
+        i, length = np.tile(i, 2), np.tile(length, 2)
+        j = np.concatenate((c, (c - 1) % n))
+        reverse = np.repeat([False, True], len(c))
+    offset = (j - i) % n
+    valid = (offset >= length) & (offset < n - 1)
+    return i[valid], length[valid], j[valid], reverse[valid]
+
+
+def _candidate_pairs(tour, position, neighbors):
+    """
+    Index pairs (i, j), i < j, where tour[j] is a neighbor of tour[i]
+    """
+    i = np.repeat(np.arange(len(tour)), neighbors.shape[1])
+    j = position[neighbors[tour].ravel()]
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def best_improvement(tour, distances, neighborhood="2opt", neighbors=None, max_moves=None, time_limit=None):
+    """
+    Steepest descent: scores every move of the neighborhood by its delta and
+    applies the best one until no move shortens the tour.
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        neighborhood (str): one of NEIGHBORHOODS
+        neighbors (2d-array): candidate lists, if given only moves between
+                              neighboring cities are scored
+        max_moves (int): stop after this many moves
+        time_limit (float): stop after this many seconds
+
+    Returns:
+        Tuple containing the improved tour and its distance
+    """
+    tour = np.array(tour)
+    n = len(tour)
+    position = np.empty(n, dtype=int)
+    position[tour] = np.arange(n)
+    apply = apply_swap if neighborhood == "swap" else apply_two_opt
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    moves = 0
+    symmetric = is_symmetric(distances)
+    reversal = None if symmetric else reversal_sums(tour, distances)
+    checked, check_at = measure_distance(tour, distances), n
+
+    if neighbors is None:
+        i, j = np.triu_indices(n, 1)
+    while n > 3 and (max_moves is None or moves < max_moves) and (deadline is None or time.perf_counter() < deadline):
+        best_delta, best_move = -1e-10, None
+        if neighborhood != "oropt":
+            if neighbors is not None:
+                i, j = _candidate_pairs(tour, position, neighbors)
+            if neighborhood == "swap":
+                delta = swap_deltas(tour, distances, i, j)
+            else:
+                delta = two_opt_deltas(tour, distances, i, j, reversal)
+            best = np.argmin(delta)
+            if delta[best] < best_delta:
+                best_delta, best_move = delta[best], (apply, (i[best], j[best]))
+        if neighborhood in ("oropt", "or2opt"):
+            move = _or_opt_moves(tour, position, neighbors)
+            delta = or_opt_delta(tour, distances, *move, reversal=reversal)
+            if len(delta) and delta.min() < best_delta:
+                best = np.argmin(delta)
+                best_move = (apply_or_opt, tuple(m[best] for m in move))
+        if best_move is None:
+            break
+        best_move[0](tour, position, *best_move[1])
+        moves += 1
+        if not symmetric:
+            reversal = reversal_sums(tour, distances)
+        if moves >= check_at:
+            checked, check_at = _check_progress(tour, distances, checked), moves + n
+            if checked is None:
+                break
+
+    return tour, measure_distance(tour, distances)
+
+
+def _moves(tour, position, a, c, neighborhood):
+    """
+    Moves that connect city a to its neighbor c, as tuples of the delta
+    function, the function that applies the move, its arguments and the
+    indices of the cities whose edges change. A generator, so the cheaper
+    moves are scored first.
+    """
+    n = len(tour)
+    i, j = position[a], position[c]
+    if neighborhood == "swap":
+        # Move c next to a by swapping it with a's successor or predecessor
+        for m in (((i + 1) % n, j), ((i - 1) % n, j)):
+            if m[0] != m[1]:
+                yield swap_delta, apply_swap, m, [p + k for p in m for k in (-1, 0, 1)]
+    if neighborhood in ("2opt", "or2opt"):
+        # Connect a to c either through their successors or predecessors
+        for m in ((i, j), ((i - 1) % n, (j - 1) % n)):
+            if m[0] != m[1]:
+                yield two_opt_delta, apply_two_opt, m, [p + k for p in m for k in (-1, 0, 1)]
+    if neighborhood in ("oropt", "or2opt"):
+        # Move the segment starting at a to right after c, or reversed to right before c
+        for length in range(1, min(3, n - 3) + 1):
+            for m in ((i, length, j, False), (i, length, (j - 1) % n, True)):
+                if length <= (m[2] - i) % n < n - 1:
+                    yield or_opt_delta, apply_or_opt, m, [i - 1, i, i + length - 1, i + length, m[2], m[2] + 1]
+
+
+def _check_progress(tour, distances, checked):
+    """
+    Guard against deltas that are off, which would make the search go in
+    circles: a search that only makes improving moves can't come back to a
+    tour, so the tour must be shorter than when it was last checked.
+
+    Returns:
+        The length of the tour, or None if it got no shorter
+    """
+    length = measure_distance(tour, distances)
+    return length if length < checked else None
+
+
+def first_improvement(tour, distances, neighborhood="2opt", neighbors=None, max_moves=None, time_limit=None):
+    """
+    First-improvement local search with neighbor lists and don't-look bits.
+    Every city starts in a queue of active cities. The moves that connect an
+    active city to one of its neighbors are scored by their delta, the first
+    improving one is applied and the cities at the changed edges are
+    reactivated. A city without improving moves is dropped from the queue.
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        neighborhood (str): one of NEIGHBORHOODS
+        neighbors (2d-array): candidate lists, defaults to the 10 closest cities
+        max_moves (int): stop after this many moves
+        time_limit (float): stop after this many seconds
+
+    Returns:
+        Tuple containing the improved tour and its distance
+    """
+    tour = np.array(tour)
+    n = len(tour)
+    if neighbors is None:
+        neighbors = candidate_lists(distances, 10)
+    position = np.empty(n, dtype=int)
+    position[tour] = np.arange(n)
+    queue = deque(tour.tolist())
+    active = np.ones(n, dtype=bool)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    moves = 0
+    symmetric = is_symmetric(distances)
+    reversal = None if symmetric else reversal_sums(tour, distances)
+    checked, check_at = measure_distance(tour, distances), n
+
+    def delta(move):
+        if move[0] is swap_delta:
+            return swap_delta(tour, distances, *move[2])
+        return move[0](tour, distances, *move[2], reversal=reversal)
+
+    while n > 3 and queue and (max_moves is None or moves < max_moves) and (deadline is None or time.perf_counter() < deadline):
+        a = queue.popleft()
+        active[a] = False
+        for c in neighbors[a]:
+            move = next((m for m in _moves(tour, position, a, c, neighborhood) if delta(m) < -1e-10), None)
+            if move is not None:
+                touched = {tour[p % n] for p in move[3]}
+                move[1](tour, position, *move[2])
+                moves += 1
+                if not symmetric:
+                    reversal = reversal_sums(tour, distances)
+                for city in touched:
+                    if not active[city]:
+                        active[city] = True
+                        queue.append(city)
+                break
+        if moves >= check_at:
+            checked, check_at = _check_progress(tour, distances, checked), moves + n
+            if checked is None:
+                break
+
+    return tour, measure_distance(tour, distances)
+
+
+class _Float64Distances:
+    """
+    Reads a float32 distance table as float64. Deltas summed in float32 can
+    look improving from rounding alone and make the search go in circles.
+    """
+
+    def __init__(self, distances):
+        self.distances = distances
+        self.shape = distances.shape
+        self.dtype = np.dtype(np.float64)
+        self.ndim = 2
+        self.symmetric = is_symmetric(distances)
+
+    def __len__(self):
+        return len(self.distances)
+
+    def __getitem__(self, key):
+        return np.asarray(self.distances[key], dtype=np.float64)
+
+
+def local_search(tour, distances, neighborhood="2opt", strategy="first", neighbors=None, max_moves=None,
+                 time_limit=None):
+    """
+    Improves a tour with swap, 2-opt or Or-opt moves that are scored by the
+    change in length of the edges they touch, without copying the tour.
+    "or2opt" tries both 2-opt and Or-opt moves, which together reach most
+    of the improvements of a 3-opt search at a fraction of the cost.
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        neighborhood (str): one of NEIGHBORHOODS
+        strategy (str): "first" or "best" improvement
+        neighbors (2d-array): candidate lists from candidates.candidate_lists
+        max_moves (int): stop after this many moves
+        time_limit (float): stop after this many seconds
+
+    Returns:
+        Tuple containing the improved tour and its distance
+    """
+    if isinstance(distances, list):
+        distances = np.asarray(distances)
+    if neighborhood not in NEIGHBORHOODS:
+        raise ValueError(f"Unknown neighborhood: {neighborhood}")
+    if distances.dtype != np.float64:
+        if neighbors is None and strategy != "best":
+            neighbors = candidate_lists(distances, 10)
+        distances = _Float64Distances(distances)
+    if strategy == "best":
+        return best_improvement(tour, distances, neighborhood, neighbors, max_moves, time_limit)
+    return first_improvement(tour, distances, neighborhood, neighbors, max_moves, time_limit)
@@ -0,0 +1,185 @@
+import numpy as np
+from general_tools import *
+
+
+def _pairs(k, n, rng):
+    """
+    Two different random indices for each of k tours, first one smallest
+    """
+    i = rng.integers(n, size=k)
+    j = (i + rng.integers(1, n, size=k)) % n
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def _remap(tours, index):
+    """
+    Rearranges every row of tours by its row of index, tours[r][index[r]]
+    """
+    return np.take_along_axis(tours, index, axis=1)
+
+
+def insert_mutation_batch(tours, distances, rng=None):
+    """
+    Insert-mutation of many tours at once, the same move as
+    genetic_algorithm.insert_mutation: the city at index j is moved to index
+    i + 1. Only the three edges that change are looked at to find the change
+    in distance.
+    Args:
+        tours (2d-array): one permutation per row, at least 2 cities
+        distances (2d-array): table over distances
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Tuple containing the mutated tours and the change in distance of each
+    """
+    rng = np.random.default_rng(rng)
+    tours = np.asarray(tours)
+    k, n = tours.shape
+    rows = np.arange(k)
+    i, j = rng.integers(n, size=(2, k))
+    j = np.where(i == j, (j + rng.integers(1, n, size=k)) % n, j)
+    target = np.where(j > i, i + 1, np.minimum(i + 1, n - 1))
+
+    p = np.arange(n)
+    forward = (j > i)[:, np.newaxis] & (p > target[:, np.newaxis]) & (p <= j[:, np.newaxis])
+    backward = (j < i)[:, np.newaxis] & (p >= j[:, np.newaxis]) & (p < target[:, np.newaxis])
+    index = np.where(forward, p - 1, np.where(backward, p + 1, p))
+    index[rows, target] = j
+    mutated = _remap(tours, index)
+
+    city = tours[rows, j]
+    before, after = tours[rows, j - 1], tours[rows, (j + 1) % n]
+    left, right = mutated[rows, target - 1], mutated[rows, (target + 1) % n]
+    delta = distances[before, after] - distances[before, city] - distances[city, after] \
+        + distances[left, city] + distances[city, right] - distances[left, right]
+    return mutated, np.where((left == before) & (right == after), 0.0, delta)
+
+
+def swap_mutation_batch(tours, distances, rng=None):
+    """
+    Swap-mutation of many tours at once, two random cities trade places.
+    Only the (up to) four edges touching them are looked at to find the
+    change in distance.
+    Args:
+        tours (2d-array): one permutation per row, at least 2 cities
+        distances (2d-array): table over distances
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Tuple containing the mutated tours and the change in distance of each
+    """
+    rng = np.random.default_rng(rng)
+    tours = np.asarray(tours)
+    k, n = tours.shape
+    rows = np.arange(k)
+    i, j = _pairs(k, n, rng)
+    mutated = tours.copy()
+    mutated[rows, i], mutated[rows, j] = tours[rows, j], tours[rows, i]
+
+    delta = np.zeros(k)
+    seen = []
+    for edge in ((i - 1) % n, i, (j - 1) % n, j):
+        duplicate = np.zeros(k, dtype=bool)
+        for other in seen:
+            duplicate |= other == edge
+        nxt = (edge + 1) % n
+        change = distances[mutated[rows, edge], mutated[rows, nxt]] - distances[tours[rows, edge], tours[rows, nxt]]
+        delta += np.where(duplicate, 0.0, change)
+        seen.append(edge)
+    return mutated, delta
+
+
+def inversion_mutation_batch(tours, distances, rng=None):
+    """
+    Inversion-mutation of many tours at once, a random segment is reversed.
+    This is a 2-opt move: the two edges at the ends of the segment change,
+    and the edges inside it are walked the other way, which only changes
+    their length when the distance table is asymmetric. Only then are they
+    looked at, see general_tools.is_symmetric.
+    Args:
+        tours (2d-array): one permutation per row, at least 2 cities
+        distances (2d-array): table over distances
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Tuple containing the mutated tours and the change in distance of each
+    """
+    rng = np.random.default_rng(rng)
+    tours = np.asarray(tours)
+    k, n = tours.shape
+    rows = np.arange(k)
+    i, j = _pairs(k, n, rng)
+    p = np.arange(n)
+    inside = (p >= i[:, np.newaxis]) & (p <= j[:, np.newaxis])
+    mutated = _remap(tours, np.where(inside, (i + j)[:, np.newaxis] - p, p))
+
+    a, b = tours[rows, i - 1], tours[rows, i]
+    c, d = tours[rows, j], tours[rows, (j + 1) % n]
+    # When the whole tour is reversed, the edge from its last to its first city is reversed as well
+    ends = np.where((i == 0) & (j == n - 1), distances[b, a] - distances[a, b],
+                    distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d])
+    if is_symmetric(distances):
+        return mutated, ends
+    q = np.arange(n - 1)
+    reversed_edges = (q >= i[:, np.newaxis]) & (q < j[:, np.newaxis])
+    inner = np.where(reversed_edges,
+                     distances[tours[:, 1:], tours[:, :-1]] - distances[tours[:, :-1], tours[:, 1:]], 0.0)
+    return mutated, ends + inner.sum(axis=1)
+
+
+def scramble_mutation_batch(tours, distances, rng=None):
+    """
+    Scramble-mutation of many tours at once, the cities of a random segment
+    are shuffled. Only the edges in and around the segment are looked at to
+    find the change in distance.
+    Args:
+        tours (2d-array): one permutation per row, at least 2 cities
+        distances (2d-array): table over distances
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Tuple containing the mutated tours and the change in distance of each
+    """
+    rng = np.random.default_rng(rng)
+    tours = np.asarray(tours)
+    k, n = tours.shape
+    rows = np.arange(k)[:, np.newaxis]
+    i, j = _pairs(k, n, rng)
+    p = np.arange(n)
+    inside = (p >= i[:, np.newaxis]) & (p <= j[:, np.newaxis])
+    keys = np.where(inside, i[:, np.newaxis] + rng.random((k, n)) * (j - i + 1)[:, np.newaxis], p)
+    mutated = _remap(tours, np.argsort(keys, axis=1, kind="stable"))
+
+    # Edge e goes from index e to e + 1, the ones from i - 1 to j can change
+    edges = inside | np.roll(inside, -1, axis=1)
+    edge_rows, edge = np.nonzero(edges)
+    nxt = (edge + 1) % n
+    change = distances[mutated[edge_rows, edge], mutated[edge_rows, nxt]] - \
+        distances[tours[edge_rows, edge], tours[edge_rows, nxt]]
+    return mutated, np.bincount(edge_rows, weights=change, minlength=k)
+
+
+def mutate(tour, distances, mutation="insert", rng=None):
+    """
+    Mutates one tour and finds the change in its distance without measuring it
+    Args:
+        tour (np.array)
+        distances (2d-array): table over distances
+        mutation: batch mutation operator, or its name in MUTATIONS
+        rng (np.random.Generator): random number generator, or a seed
+
+    Returns:
+        Tuple containing the mutated tour and the change in distance
+    """
+    if isinstance(mutation, str):
+        mutation = MUTATIONS[mutation]
+    mutated, delta = mutation(np.asarray(tour)[np.newaxis], distances, rng)
+    return mutated[0], delta[0]
+
+
+MUTATIONS = {
+    "insert": insert_mutation_batch,
+    "swap": swap_mutation_batch,
+    "inversion": inversion_mutation_batch,
+    "scramble": scramble_mutation_batch,
+}
@@ -0,0 +1,173 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+# Distance table of the worker process, attached to shared memory once per worker
+_distances = None
+_shared = None
+
+
+def share_array(array):
+    """
+    Copies an array into a new block of shared memory
+    Args:
+        array (np.array)
+
+    Returns:
+        Tuple containing the SharedMemory block and the arguments for attach_array
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach_array(name, shape, dtype):
+    """
+    Attaches to an array created by share_array without copying it
+    Args:
+        name (str): Name of the shared memory block
+        shape (tuple): Shape of the array
+        dtype (str): Data type of the array
+
+    Returns:
+        Tuple containing the SharedMemory block and the array backed by it
+    """
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _whole_file(distances):
+    """
+    Whether a memory mapped array is a whole .npy file, and not a slice or
+    other view of one, so that opening the file again gives the same array
+    """
+    if distances.filename is None or not distances.flags.c_contiguous:
+        return False
+    try:
+        with open(distances.filename, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else \
+                np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            header_size = f.tell()
+    except (OSError, ValueError):
+        return False
+    return (not fortran_order and distances.offset == header_size and tuple(distances.shape) == tuple(shape)
+            and distances.dtype == dtype)
+
+
+def share_distances(distances):
+    """
+    Makes distances available to other processes without pickling them. A
+    matrix is copied into shared memory, a memory mapped .npy file is opened
+    again by its filename when the array is the whole file, and distances computed from coordinates only
+    share their coordinates.
+    Args:
+        distances (2d-array): table over distances, any backend
+
+    Returns:
+        Tuple containing the SharedMemory blocks to release and the
+        arguments for attach_distances
+    """
+    from instances import CoordinateDistances
+
+    if isinstance(distances, CoordinateDistances):
+        block, shared = share_array(distances.coordinates)
+        return [block], ("coordinates", shared, distances.metric, distances.dtype.str)
+    if isinstance(distances, np.memmap) and _whole_file(distances):
+        return [], ("memmap", distances.filename)
+    block, shared = share_array(distances)
+    return [block], ("array", shared)
+
+
+def attach_distances(shared):
+    """
+    Opens distances made available by share_distances
+    Args:
+        shared (tuple): the arguments returned by share_distances
+
+    Returns:
+        Tuple containing the SharedMemory block, or None, and the distances
+    """
+    if shared[0] == "memmap":
+        return None, np.load(shared[1], mmap_mode="r")
+    block, array = attach_array(*shared[1])
+    if shared[0] == "coordinates":
+        from instances import CoordinateDistances
+        return block, CoordinateDistances(array, shared[2], shared[3])
+    return block, array
+
+
+def release(blocks):
+    """
+    Closes and removes shared memory blocks created by share_array
+    """
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _init_worker(shared):
+    global _shared, _distances
+    _shared, _distances = attach_distances(shared)
+
+
+def run_seeds(seed, number_of_runs):
+    """
+    Independent random streams for each run, derived from one seed so a
+    batch of runs can be reproduced whichever process runs each of them
+    Args:
+        seed (int): Seed of the batch, None for a random batch
+        number_of_runs (int)
+
+    Returns:
+        List of np.random.SeedSequence, one for each run
+    """
+    return np.random.SeedSequence(seed).spawn(number_of_runs)
+
+
+def _run(algorithm, cities, args, kwargs, seed, distances=None):
+    start = time.time()
+    result = algorithm(cities, _distances if distances is None else distances, *args,
+                       rng=np.random.default_rng(seed), **kwargs)
+    return result, time.time() - start
+
+
+def run_parallel(algorithm, cities, distances, number_of_runs, *args, workers=None, seed=None, **kwargs):
+    """
+    Runs an algorithm several times on a pool of worker processes. The
+    distance table is placed in shared memory once instead of being pickled
+    for every run, and each run gets its own np.random.Generator derived
+    from seed, so the results do not depend on the number of workers.
+    Args:
+        algorithm: Function called as algorithm(cities, distances, *args, rng=rng, **kwargs)
+        cities: List of all cities to visit
+        distances (2d-array): table over distances
+        number_of_runs (int)
+        workers (int): Number of processes, defaults to one per core
+        seed (int): Seed of the batch of runs
+
+    Yields:
+        Tuple containing the index of the run, its result and how long it
+        took, as each run finishes
+    """
+    seeds = run_seeds(seed, number_of_runs)
+    workers = min(workers or os.cpu_count(), number_of_runs)
+    if workers <= 1:
+        for run, run_seed in enumerate(seeds):
+            yield (run,) + _run(algorithm, cities, args, kwargs, run_seed, distances)
+        return
+
+    blocks, shared = share_distances(distances)
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared,))
+    try:
+        futures = {pool.submit(_run, algorithm, cities, args, kwargs, run_seed): run
+                   for run, run_seed in enumerate(seeds)}
+        for future in as_completed(futures):
+            yield (futures[future],) + future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+        release(blocks)
@@ -1,6 +1,5 @@
 #Breddegrad, lengdegrad
 import numpy as np
-import matplotlib.pyplot as plt
 
 city_coordinates_numbered = {   0: (41.3828939, 2.1774322),
                                 1: (44.8178131, 20.4568974),
@@ -66,6 +65,8 @@ def plot_tour(tour, show_map = False, figsize = (8, 8), annotate = False):
            plot_tour(['Barcelona', 'Belgrade', 'Dublin', 'Barcelona'])
            plot_tour([1, 2, 4, 6, 3, 1])
     """
+    import matplotlib.pyplot as plt  # Only loaded when plotting, the coordinates are used by headless runs
+
     if not tour[-1] == tour[0]:
         tour = list(tour)
         tour.append(tour[0])  
@@ -0,0 +1,102 @@
+import numpy as np
+from genetic_algorithm import genetic_algorithm
+from hill_climbing import hill_climbing
+from parallel import run_parallel
+
+
+def print_info(results, total_dist, number_of_runs):
+    """
+    Prints out info based on results
+    Args:
+        results (List): Containing results of runs, (tour, distance)
+        total_dist (float): Sum of all distances
+        number_of_runs (int): How many times the algorithm ran
+    """
+    average = total_dist / number_of_runs
+    std = np.std([tup[1] for tup in results])
+
+    best_dist = float("inf")
+    worst_dist = 0
+    best_tour = worst_tour = None
+
+    for tour, dist in results:
+        if dist < best_dist:
+            best_tour = tour
+            best_dist = dist
+        elif dist > worst_dist:
+            worst_tour = tour
+            worst_dist = dist
+
+    print(f"\nBest:                {'->'.join(best_tour)}")
+    print(f"Best distance:       {best_dist}")
+    print(f"\nWorst:               {'->'.join(worst_tour)}")
+    print(f"Worst distance:      {worst_dist}")
+    print(f"\nAverage distance:    {average}")
+    print(f"Standard deviation:  {std}")
+
+
+def measure_genetic(number_of_runs, pop_size, num_gens, p_mutation, cities, distances, workers=None, seed=None):
+    """
+    Method that runs the genetic algorithm several times and measures how well it
+    does. It calculates the average and standard deviation of all the runs as well
+    as it plots the average of each generation. The runs are spread over a pool
+    of worker processes.
+    Args:
+        number_of_runs (int)
+        pop_size (int): Population size
+        num_gens (int): Number of generations
+        p_mutation (float): Chance of mutation
+        cities: List of all cities to visit
+        distances (2d-list): table over distances
+        workers (int): Number of processes, defaults to one per core
+        seed (int): Seed that makes the batch of runs reproducible
+    """
+    import matplotlib.pyplot as plt
+
+    results = []
+    total_dist = 0
+    total_time = 0
+    generations = []  # Each index is the best of each generation for one of the runs
+
+    for _, result, run_time in run_parallel(genetic_algorithm, cities, distances, number_of_runs,
+                                            pop_size, p_mutation, num_gens, workers=workers, seed=seed):
+        total_dist += result[1]
+        results.append(result[:2])
+        generations.append(result[2])
+        total_time += run_time
+
+    print(f"\nResults of genetic algorithm over {number_of_runs} runs")
+    print(f"Population:            {pop_size}")
+    print(f"Number of generations: {num_gens}")
+    print(f"Chance of mutations:   {p_mutation*100}%")
+    print(f"Average time:          {total_time/number_of_runs} s")
+    print_info(results, total_dist, number_of_runs)
+
+    average_of_generations = [0]*num_gens
+    for i in range(number_of_runs):
+        for j in range(num_gens):
+            average_of_generations[j] += generations[i][j]/number_of_runs
+    plt.plot(average_of_generations, label=f"Population size: {pop_size}")
+
+
+def measure_hill_climbing(number_of_runs, cities, distances, workers=None, seed=None):
+    """
+    Runs the hill climbing algorithm n times to measure how well it does. The
+    runs are spread over a pool of worker processes.
+    Args:
+        number_of_runs (int)
+        cities: List of all cities to visit
+        distances (2d-list): table over distances
+        workers (int): Number of processes, defaults to one per core
+        seed (int): Seed that makes the batch of runs reproducible
+    """
+    results = []
+    total_dist = 0
+
+    for _, result, _ in run_parallel(hill_climbing, cities, distances, number_of_runs,
+                                     workers=workers, seed=seed):
+        total_dist += result[1]
+        results.append(result)
+
+    print(f"\nResults of hill climbing on {len(cities)} cities {number_of_runs} times")
+    print_info(results, total_dist, number_of_runs)
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from crossover import CROSSOVERS
+from mutation import MUTATIONS
+from genetic_algorithm import SELECTIONS, genetic_algorithm
+from hybrid_algorithm import hybrid_algorithm
+from hill_climbing import hill_climbing
+from exhaustive_search import EXACT_SOLVERS
+from local_search import NEIGHBORHOODS
+from instances import BACKENDS, METRICS, TSPLIB_SECTIONS, CoordinateDistances, load_instance, to_backend
+from candidates import load_candidate_lists
+from instrumentation import GenerationMonitor
+from parallel import run_parallel, run_seeds
+from stopping import StoppingCriteria
+
+ALGORITHMS = ("exhaustive", "hill_climbing", "genetic", "hybrid")
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def emit(record):
+    """
+    Writes a record to stdout as one line of JSON, flushed right away so that
+    a reader sees every line as soon as it is written
+    Args:
+        record (dict): has an "event" key, see main
+    """
+    sys.stdout.write(json.dumps(record, default=_to_json) + "\n")
+    sys.stdout.flush()
+
+
+def load_distances(args):
+    """
+    Loads the instance in the storage chosen on the command line, see
+    instances.to_backend. "dense" reads the distance matrix, cached next to
+    the instance unless --no-cache is given. "coordinates" and "memmap" never
+    build the whole matrix in memory: "coordinates" computes distances when
+    they are needed and "memmap" writes them to a .npy file next to the
+    instance, which later runs reuse.
+    Args:
+        args (argparse.Namespace): parsed command line
+
+    Returns:
+        Tuple containing names of cities and the distances
+    """
+    if args.backend == "dense":
+        cities, distances = load_instance(args.instance, cache=args.cache)
+        return cities, distances if args.dtype is None else to_backend(distances, "dense", args.dtype)
+
+    cities, distances = load_instance(args.instance, cache=False, lazy=True)
+    if args.backend == "coordinates":
+        if not isinstance(distances, CoordinateDistances):
+            raise ValueError(f"{args.instance} has no coordinates, the coordinates backend needs a TSPLIB "
+                             f"instance with EUC_2D, ATT or GEO edge weights")
+        return cities, to_backend(distances, "coordinates", args.dtype)
+
+    dtype = np.dtype(args.dtype or distances.dtype)
+    filename = f"{args.instance}.dist.{dtype.name}.npy"
+    if os.path.exists(filename) and os.path.getmtime(filename) >= os.path.getmtime(args.instance):
+        return cities, np.load(filename, mmap_mode="r")
+    return cities, to_backend(distances, "memmap", dtype, filename)
+
+
+def make_solver(args):
+    """
+    Picks the algorithm and its arguments from the command line
+    Args:
+        args (argparse.Namespace): parsed command line
+
+    Returns:
+        Tuple containing the function, called as
+        function(cities, distances, *positional, rng=rng, **keywords), its
+        positional and keyword arguments
+    """
+    if args.algorithm == "hill_climbing":
+        return hill_climbing, (args.neighborhood or "swap", args.strategy or "best"), {"time_limit": args.time_limit}
+
+    stop = None
+    if args.time_limit is not None or args.stagnation is not None or args.target is not None:
+        stop = StoppingCriteria(stagnation=args.stagnation, target=args.target, time_limit=args.time_limit)
+    keywords = {"crossover": args.crossover, "mutation": args.mutation, "selection": args.selection, "stop": stop}
+    positional = (args.pop_size, args.p_mutation, args.generations)
+    if args.algorithm == "genetic":
+        return genetic_algorithm, positional, keywords
+    keywords.update(neighborhood=args.neighborhood or "2opt", strategy=args.strategy or "first")
+    return hybrid_algorithm, positional, keywords
+
+
+def _result(algorithm, cities, result):
+    """
+    The tour as city names, its distance and why the run stopped, from the
+    return value of an algorithm
+    """
+    if algorithm == "genetic":
+        return {"tour": result[0], "distance": result[1], "reason": result[3]}
+    if algorithm == "hybrid":
+        return {"tour": [cities[i] for i in result[0]], "distance": result[1], "reason": result[2]}
+    return {"tour": result[0], "distance": result[1], "reason": None}
+
+
+def solve_exact(args, cities, distances):
+    """
+    Runs one of the exact solvers of exhaustive_search, streaming the
+    progress of the parallel search
+    """
+    def progress(examined, tours_per_second, best):
+        emit({"event": "progress", "examined": examined, "tours_per_second": tours_per_second, "best": best})
+
+    keywords = {"workers": args.workers, "progress": progress if args.progress else None} \
+        if args.exact == "parallel" else {}
+    start = time.perf_counter()
+    tour, dist = EXACT_SOLVERS[args.exact](cities, distances, **keywords)
+    emit({"event": "result", "run": 0, "tour": tour, "distance": dist, "reason": "optimal",
+          "time": time.perf_counter() - start})
+    return [dist], []
+
+
+def solve(args, cities, distances):
+    """
+    Runs the algorithm args.runs times. Runs in this process stream the
+    stats of every generation, runs on a pool of workers report when each of
+    them finishes. Every run draws from its own stream of parallel.run_seeds,
+    so the results are the same for any number of workers.
+    Args:
+        args (argparse.Namespace): parsed command line
+        cities: names of cities
+        distances (2d-array): table over distances
+
+    Returns:
+        Tuple containing the distance of each run and the best distance of
+        each generation of each run, where known
+    """
+    function, positional, keywords = make_solver(args)
+    if args.algorithm == "hybrid" and args.cache:
+        # Built once and saved next to the instance, instead of by every run
+        keywords["candidates"] = load_candidate_lists(args.instance, distances)
+    dists, curves = [], []
+    if args.runs == 1 or args.workers == 1:
+        for run, stream in enumerate(run_seeds(args.seed, args.runs)):
+            monitor = None
+            if args.algorithm in ("genetic", "hybrid") and (args.progress or args.plot):
+                callback = (lambda stats, run=run: emit({"event": "generation", "run": run, **stats}))
+                monitor = GenerationMonitor(*([callback] if args.progress else []))
+                keywords["monitor"] = monitor
+            start = time.perf_counter()
+            result = function(cities, distances, *positional, rng=np.random.default_rng(stream), **keywords)
+            emit({"event": "result", "run": run, **_result(args.algorithm, cities, result),
+                  "time": time.perf_counter() - start})
+            dists.append(result[1])
+            if monitor is not None:
+                curves.append([stats["best"] for stats in monitor.history])
+        return dists, curves
+
+    for run, result, run_time in run_parallel(function, cities, distances, args.runs, *positional,
+                                              workers=args.workers, seed=args.seed, **keywords):
+        emit({"event": "result", "run": run, **_result(args.algorithm, cities, result), "time": run_time})
+        dists.append(result[1])
+        if args.algorithm == "genetic":
+            curves.append(result[2])
+    return dists, curves
+
+
+def plot_convergence(curves, plot_file):
+    """
+    Saves the best distance of each generation of each run to an image.
+    matplotlib is only imported here, and draws without a display.
+    Args:
+        curves (list): best distance of each generation, one list per run
+        plot_file (str): filename of the image
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    for curve in curves:
+        plt.plot(curve)
+    plt.title("Best distance of each generation")
+    plt.ylabel("Distance")
+    plt.xlabel("Generations")
+    plt.savefig(plot_file)
+    plt.close()
+
+
+def _edge_weight_type(instance_file):
+    """
+    The EDGE_WEIGHT_TYPE of a TSPLIB instance from its header, None for csv
+    instances, which only hold distances
+    """
+    if not instance_file.endswith(".tsp"):
+        return None
+    with open(instance_file) as f:
+        for line in f:
+            keyword = line.split(":")[0].strip().upper()
+            if keyword in TSPLIB_SECTIONS:
+                break
+            if keyword == "EDGE_WEIGHT_TYPE":
+                return line.split(":", 1)[1].strip().upper()
+    return "EXPLICIT"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a TSP instance and stream the progress and results as "
+                                                 "JSON lines")
+    parser.add_argument("algorithm", choices=ALGORITHMS)
+    parser.add_argument("instance", help="csv file like european_cities.csv or TSPLIB .tsp file")
+    parser.add_argument("--runs", type=int, default=1, help="independent runs of the algorithm")
+    parser.add_argument("--workers", type=int, help="processes for the runs and the parallel exact solver, "
+                                                    "defaults to one per core")
+    parser.add_argument("--seed", type=int, help="seed that makes the runs reproducible")
+    parser.add_argument("--time-limit", type=float, help="seconds each run may take, not used by exhaustive")
+    parser.add_argument("--stagnation", type=int, help="stop after this many generations without improvement")
+    parser.add_argument("--target", type=float, help="stop when a tour is at most this long")
+    parser.add_argument("--pop-size", type=int, default=100, help="population size, an even number")
+    parser.add_argument("--generations", type=int, default=100)
+    parser.add_argument("--p-mutation", type=float, default=0.5, help="chance of mutation")
+    parser.add_argument("--crossover", choices=list(CROSSOVERS), default="pmx")
+    parser.add_argument("--mutation", choices=list(MUTATIONS), default="insert")
+    parser.add_argument("--selection", choices=list(SELECTIONS), default="ranked")
+    parser.add_argument("--neighborhood", choices=NEIGHBORHOODS,
+                        help="local search moves, defaults to swap for hill_climbing and 2opt for hybrid")
+    parser.add_argument("--strategy", choices=("first", "best"),
+                        help="local search strategy, defaults to best for hill_climbing and first for hybrid")
+    parser.add_argument("--exact", choices=list(EXACT_SOLVERS), default="branch_and_bound",
+                        help="solver used by exhaustive")
+    parser.add_argument("--no-progress", dest="progress", action="store_false",
+                        help="only write the results, not the stats of every generation")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="don't write the distance matrix and the candidate lists of hybrid next to the "
+                             "instance, see instances.load_instance and candidates.load_candidate_lists")
+    parser.add_argument("--backend", choices=BACKENDS, default="dense",
+                        help="storage of the distances, coordinates and memmap don't hold the whole matrix in "
+                             "memory, see load_distances")
+    parser.add_argument("--dtype", choices=("float64", "float32"), help="type of the distances, float32 halves "
+                                                                         "their memory")
+    parser.add_argument("--plot", metavar="FILE", help="save the best distance of each generation to an image")
+    args = parser.parse_args(argv)
+
+    if args.pop_size % 2 == 1:
+        parser.error("--pop-size must be an even number")
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+    if args.plot and args.algorithm not in ("genetic", "hybrid"):
+        parser.error("--plot needs the genetic or hybrid algorithm")
+    if args.plot and args.algorithm == "hybrid" and args.runs > 1 and args.workers != 1:
+        # Only runs in this process record the curve of the hybrid algorithm
+        parser.error("--plot with several hybrid runs needs --workers 1")
+    if args.backend == "coordinates" and os.path.exists(args.instance) \
+            and _edge_weight_type(args.instance) not in METRICS:
+        parser.error(f"--backend coordinates needs a TSPLIB instance with EUC_2D, ATT or GEO edge weights, "
+                     f"{args.instance} has no coordinates")
+    return args
+
+
+def main(argv=None):
+    """
+    Command line entry point. Writes one JSON object per line to stdout:
+    "start" with the settings, "generation" with the stats of every
+    generation, see instrumentation.GenerationMonitor, "progress" of the
+    parallel exact solver, "result" for each run and "summary" at the end.
+    """
+    args = parse_args(argv)
+    start = time.perf_counter()
+    cities, distances = load_distances(args)
+    emit({"event": "start", "algorithm": args.algorithm, "instance": os.path.abspath(args.instance),
+          "cities": len(cities), "runs": args.runs, "workers": args.workers, "seed": args.seed,
+          "time_limit": args.time_limit, "backend": args.backend, "dtype": str(distances.dtype)})
+
+    if args.algorithm == "exhaustive":
+        dists, curves = solve_exact(args, cities, distances)
+    else:
+        dists, curves = solve(args, cities, distances)
+    if args.plot and curves:
+        plot_convergence(curves, args.plot)
+
+    emit({"event": "summary", "runs": len(dists), "best": min(dists), "average": float(np.mean(dists)),
+          "std": float(np.std(dists)), "worst": max(dists), "time": time.perf_counter() - start})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from general_tools import *
+from genetic_algorithm import initiate_population, tournament_selection
+from crossover import CROSSOVERS, pmx_offspring
+from mutation import MUTATIONS, insert_mutation_batch
+from candidates import candidate_lists
+from local_search import local_search
+from parallel import share_array, attach_array, share_distances, attach_distances, release
+from stopping import GENERATIONS
+
+# Distance table and candidate lists of the worker process
+_distances = None
+_neighbors = None
+_blocks = []
+
+
+def _init_worker(shared_distances, shared_neighbors):
+    global _distances, _neighbors
+    block, _distances = attach_distances(shared_distances)
+    _blocks.append(block)
+    if shared_neighbors is not None:
+        block, _neighbors = attach_array(*shared_neighbors)
+        _blocks.append(block)
+
+
+def _evaluate(tour, neighborhood, strategy, max_moves, time_limit):
+    """
+    Measures a child, after improving it with local search if a neighborhood is given
+    """
+    if neighborhood is None:
+        return tour, measure_distance(tour, _distances)
+    return local_search(tour, _distances, neighborhood, strategy, _neighbors, max_moves, time_limit)
+
+
+def _offspring(population, distances, p_mutation, crossover, mutation, tournament_size, rng):
+    """
+    Two children of two parents chosen by tournament selection
+    """
+    parents = population.tours[tournament_selection(population, 2, tournament_size, rng)]
+    children = crossover(parents, rng=rng)
+    mutate = rng.random(len(children)) < p_mutation
+    if mutate.any():
+        children[mutate] = mutation(children[mutate], distances, rng=rng)[0]
+    return children
+
+
+def _replace_worst(population, tour, dist):
+    """
+    Puts a child in place of the longest tour of the population, if it is shorter
+    """
+    worst = np.argmax(population.fitness)
+    if dist < population.fitness[worst]:
+        population.tours[worst] = tour
+        population.fitness[worst] = dist
+
+
+def steady_state(cities, distances, pop_size, p_mutation, num_evaluations, crossover=pmx_offspring,
+                 mutation=insert_mutation_batch, tournament_size=0, neighborhood=None, strategy="first",
+                 max_moves=None, time_limit=None, workers=None, stop=None, rng=None):
+    """
+    Asynchronous steady-state genetic algorithm. Parents are chosen by
+    tournament selection and their children are measured, and improved by
+    local search if a neighborhood is given, in a pool of worker processes.
+    Each child replaces the longest tour of the population as soon as it
+    arrives if it is shorter, and a new child is sent off in its place, so
+    no worker waits for the slowest child of a generation.
+    Args:
+        cities:                 List of all cities to visit
+        distances (2d-array):   Table over distances
+        pop_size (int):         Population size
+        p_mutation (float):     Chance of mutation
+        num_evaluations (int):  Number of children before termination
+        crossover:              Function creating offspring, or its name in CROSSOVERS
+        mutation:               Batch mutation operator, or its name in MUTATIONS
+        tournament_size (int):  Size of each tournament, 20% of the population if 0
+        neighborhood (str):     Local search for each child, see
+                                local_search.NEIGHBORHOODS, None for none
+        strategy (str):         "first" or "best" improvement local search
+        max_moves (int):        Local search moves allowed per child
+        time_limit (float):     Seconds of local search allowed per child
+        workers (int):          Number of processes, defaults to one per
+                                core, 1 runs everything in this process
+        stop (StoppingCriteria): Criteria for stopping before num_evaluations,
+                                checked after every pop_size children
+        rng (np.random.Generator): Random number generator, or a seed. With
+                                workers the order in which children
+                                arrive, and so the run, is not reproducible
+
+    Returns:
+        A tuple containing the best individual, the shortest distance after
+        every pop_size children and why the run stopped, like genetic_algorithm
+    """
+    global _distances, _neighbors
+    if isinstance(crossover, str):
+        crossover = CROSSOVERS[crossover]
+    if isinstance(mutation, str):
+        mutation = MUTATIONS[mutation]
+    workers = workers or os.cpu_count()
+    rng = np.random.default_rng(rng)
+
+    reason = GENERATIONS
+    if stop is not None:
+        stop.start()
+    population = initiate_population(pop_size, cities, distances, rng=rng)
+    neighbors = None if neighborhood is None else candidate_lists(distances)
+    best_of_each_gen = [get_best(population)[1]]
+    arrived = 0
+
+    def settings():
+        # Local search of a child ends at the deadline of the run at the latest
+        budget = time_limit
+        if stop is not None and stop.deadline is not None:
+            budget = stop.remaining() if time_limit is None else min(time_limit, stop.remaining())
+        return neighborhood, strategy, max_moves, budget
+
+    def arrive(result):
+        # Returns the reason to stop, if any
+        nonlocal arrived
+        _replace_worst(population, *result)
+        arrived += 1
+        if arrived % pop_size == 0:
+            best_of_each_gen.append(get_best(population)[1])
+            if stop is not None and stop.check(population, pop_size):
+                return stop.reason
+        if stop is not None and stop.expired():
+            return "time_limit"
+        return None
+
+    if workers <= 1:
+        # _evaluate reads the worker state, which this process only holds for the run
+        _distances, _neighbors = distances, neighbors
+        try:
+            while arrived < num_evaluations and reason == GENERATIONS:
+                for child in _offspring(population, distances, p_mutation, crossover, mutation, tournament_size,
+                                        rng):
+                    reason = arrive(_evaluate(child, *settings())) or reason
+                    if arrived == num_evaluations or reason != GENERATIONS:
+                        break
+        finally:
+            _distances, _neighbors = None, None
+        best = get_best(population)
+        return [cities[i] for i in best[0]], best[1], best_of_each_gen, reason
+
+    blocks, shared_distances = share_distances(distances)
+    shared_neighbors = None
+    if neighbors is not None:
+        block, shared_neighbors = share_array(neighbors)
+        blocks.append(block)
+    pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(shared_distances, shared_neighbors))
+    try:
+        pending = set()
+        submitted = 0
+        while reason == GENERATIONS:
+            # Keep every worker busy with one child and one more waiting
+            while len(pending) < 2 * workers and submitted < num_evaluations:
+                for child in _offspring(population, distances, p_mutation, crossover, mutation, tournament_size, rng):
+                    if submitted < num_evaluations:
+                        pending.add(pool.submit(_evaluate, child, *settings()))
+                        submitted += 1
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                reason = arrive(future.result()) or reason
+    finally:
+        pool.shutdown(cancel_futures=True)
+        release(blocks)
+
+    best = get_best(population)
+    return [cities[i] for i in best[0]], best[1], best_of_each_gen, reason
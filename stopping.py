@@ -0,0 +1,82 @@
+import time
+from instrumentation import diversity
+
+# Reason reported when a run used all its generations
+GENERATIONS = "generations"
+
+
+class StoppingCriteria:
+    """
+    Decides when genetic_algorithm and hybrid_algorithm stop before their
+    last generation. Every criterion is off unless given. The clock starts
+    when the run calls start.
+    Args:
+        stagnation (int): stop when the best distance has not improved for
+                          this many generations
+        target (float): stop when the best distance is at most this
+        min_diversity (float): stop when the diversity of the population,
+                               see instrumentation.diversity, drops below this
+        max_evaluations (int): stop after this many tours are measured
+        time_limit (float): stop after this many seconds
+    """
+
+    def __init__(self, stagnation=None, target=None, min_diversity=None, max_evaluations=None, time_limit=None):
+        self.stagnation = stagnation
+        self.target = target
+        self.min_diversity = min_diversity
+        self.max_evaluations = max_evaluations
+        self.time_limit = time_limit
+        self.start()
+
+    def start(self):
+        """
+        Starts the clock and forgets earlier runs
+        """
+        self.deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.evaluations = 0
+        self.best = float("inf")
+        self.since_improvement = 0
+        self.reason = None
+
+    def expired(self):
+        """
+        Returns:
+            (bool): whether the time limit has passed
+        """
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def remaining(self):
+        """
+        Returns:
+            (float): seconds left, None without a time limit
+        """
+        return None if self.deadline is None else max(0.0, self.deadline - time.perf_counter())
+
+    def check(self, population, evaluations=0):
+        """
+        Checks the criteria after a generation
+        Args:
+            population (Population): population after the generation
+            evaluations (int): tours measured during the generation
+
+        Returns:
+            (str): why the run should stop, or None to go on
+        """
+        self.evaluations += evaluations
+        best = population.fitness.min()
+        if best < self.best - 1e-10:
+            self.best, self.since_improvement = best, 0
+        else:
+            self.since_improvement += 1
+
+        if self.target is not None and best <= self.target:
+            self.reason = "target"
+        elif self.stagnation is not None and self.since_improvement >= self.stagnation:
+            self.reason = "stagnation"
+        elif self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            self.reason = "max_evaluations"
+        elif self.expired():
+            self.reason = "time_limit"
+        elif self.min_diversity is not None and diversity(population) < self.min_diversity:
+            self.reason = "diversity"
+        return self.reason
@@ -0,0 +1,18 @@
+import numpy as np
+from exhaustive_search import branch_and_bound, held_karp
+
+
+def test_branch_and_bound_asymmetric():
+    rng = np.random.default_rng(14)
+    distances = rng.uniform(1, 100, (8, 8))
+    np.fill_diagonal(distances, 0)
+    cities = [str(i) for i in range(8)]
+    assert np.isclose(branch_and_bound(cities, distances)[1], held_karp(cities, distances)[1])
+
+
+def test_branch_and_bound_symmetric():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0, 100, (9, 2))
+    distances = np.linalg.norm(points[:, np.newaxis] - points, axis=2)
+    cities = [str(i) for i in range(9)]
+    assert np.isclose(branch_and_bound(cities, distances)[1], held_karp(cities, distances)[1])
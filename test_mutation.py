@@ -0,0 +1,24 @@
+import numpy as np
+from general_tools import measure_distances
+from mutation import MUTATIONS
+
+
+def _check_deltas(distances):
+    rng = np.random.default_rng(0)
+    tours = np.array([rng.permutation(len(distances)) for _ in range(200)])
+    for name, mutation in MUTATIONS.items():
+        mutated, delta = mutation(tours, distances, rng)
+        assert np.allclose(measure_distances(mutated, distances) - measure_distances(tours, distances), delta), name
+
+
+def test_deltas_asymmetric():
+    rng = np.random.default_rng(1)
+    distances = rng.uniform(1, 100, (12, 12))
+    np.fill_diagonal(distances, 0)
+    _check_deltas(distances)
+
+
+def test_deltas_symmetric():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 100, (12, 2))
+    _check_deltas(np.linalg.norm(points[:, np.newaxis] - points, axis=2))
@@ -0,0 +1,157 @@
+import numpy as np
+from collections import OrderedDict
+from general_tools import *
+
+
+def canonical_tours(tours):
+    """
+    Writes every tour in the same form no matter where it starts or which
+    way it goes: rotated so city 0 comes first, and reversed if needed so the
+    second city is smaller than the last one. Two tours are the same round
+    trip exactly when their canonical forms are equal.
+    Args:
+        tours (2d-array): one permutation of range(n) per row
+
+    Returns:
+        (2d-array): canonical form of each tour
+    """
+    tours = np.asarray(tours)
+    k, n = tours.shape
+    start = np.argmin(tours, axis=1)
+    canonical = np.take_along_axis(tours, (start[:, np.newaxis] + np.arange(n)) % n, axis=1)
+    if n > 2:
+        flip = canonical[:, 1] > canonical[:, -1]
+        canonical[flip, 1:] = canonical[flip, :0:-1]
+    return canonical
+
+
+def tour_keys(tours):
+    """
+    Hashable key of each tour, equal for rotated and reversed copies
+    Args:
+        tours (2d-array): one permutation per row
+
+    Returns:
+        List of bytes
+    """
+    canonical = np.ascontiguousarray(canonical_tours(tours), dtype=np.int32)
+    return [row.tobytes() for row in canonical]
+
+
+def unique_tours(tours):
+    """
+    Finds the first copy of every distinct tour, rotations and reversals
+    counted as copies
+    Args:
+        tours (2d-array): one permutation per row
+
+    Returns:
+        (np.array): sorted indices of the tours to keep
+    """
+    canonical = np.ascontiguousarray(canonical_tours(tours), dtype=np.int32)
+    rows = canonical.view(np.dtype((np.void, canonical.itemsize * canonical.shape[1]))).ravel()
+    return np.sort(np.unique(rows, return_index=True)[1])
+
+
+class FitnessCache:
+    """
+    Bounded least-recently-used cache of tour distances and of the local
+    optima that local search reached from a tour, keyed by the canonical form
+    of the tour. Counts hits and misses of both.
+    Args:
+        maxsize (int): tours kept in each of the two tables
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.fitness = OrderedDict()
+        self.optima = OrderedDict()
+        self.hits = self.misses = 0
+        self.optimum_hits = self.optimum_misses = 0
+
+    def _get(self, table, key):
+        value = table.get(key)
+        if value is not None:
+            table.move_to_end(key)
+        return value
+
+    def _put(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        if len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def measure(self, tours, distances):
+        """
+        measure_distances that only measures the tours it has not seen
+        Args:
+            tours (2d-array): one permutation per row
+            distances (2d-array): table over distances
+
+        Returns:
+            (np.array): distance of each tour
+        """
+        tours = np.asarray(tours)
+        keys = tour_keys(tours)
+        fitness = np.empty(len(keys))
+        missing = []
+        for i, key in enumerate(keys):
+            dist = self._get(self.fitness, key)
+            if dist is None:
+                missing.append(i)
+            else:
+                fitness[i] = dist
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            fitness[missing] = measure_distances(tours[missing], distances)
+            for i in missing:
+                self._put(self.fitness, keys[i], fitness[i])
+        return fitness
+
+    def local_optimum(self, tour):
+        """
+        Args:
+            tour (np.array)
+
+        Returns:
+            The (tour, distance) local search reached from this tour before, or None
+        """
+        result = self._get(self.optima, tour_keys([tour])[0])
+        if result is None:
+            self.optimum_misses += 1
+        else:
+            self.optimum_hits += 1
+        return result
+
+    def store_optimum(self, tour, result):
+        """
+        Remembers that local search from tour reached result. The optimum is
+        stored as well, since searching from it leads nowhere else.
+        Args:
+            tour (np.array): tour the search started from
+            result: tuple of the tour and distance it reached
+        """
+        optimum, dist = result
+        result = (np.array(optimum), dist)
+        for key in set(tour_keys([tour, optimum])):
+            self._put(self.optima, key, result)
+        self._put(self.fitness, tour_keys([optimum])[0], dist)
+
+    def stats(self):
+        """
+        Returns:
+            (dict): hits, misses and hit rates of the distance and local optimum lookups
+        """
+        lookups = self.hits + self.misses
+        optimum_lookups = self.optimum_hits + self.optimum_misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "optimum_hits": self.optimum_hits,
+            "optimum_misses": self.optimum_misses,
+            "optimum_hit_rate": self.optimum_hits / optimum_lookups if optimum_lookups else 0.0,
+            "size": len(self.fitness),
+            "optima": len(self.optima),
+        }